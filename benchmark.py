@@ -0,0 +1,261 @@
+# benchmark.py
+"""
+Offline benchmark of the scoring and haptic pipeline.
+
+    python benchmark.py                              # texts/*.txt at 1x, 10x and 100x
+    python benchmark.py --save-baseline bench.json   # store the results
+    python benchmark.py --baseline bench.json        # compare; exits 1 on a regression
+
+The transformer is replaced by a deterministic stub (StubClassifier), so runs need no network
+or model files and measure only this repository's code. Every run starts with an empty score
+cache in a temporary folder.
+
+Scenarios:
+    corpus   the bundled texts, one file each, through analyze_file and write_haptic_outputs
+    Nx       N copies of every text; copies after the first shuffle the words of each sentence
+             so the cache sees new sentences while the lexicon hit rate stays comparable
+Reported per scenario: sentences/second (best of --repeat runs), tracemalloc peak memory and
+the bytes written. A components section times word tokenization, rule scoring (from text,
+from pre-tokenized sentences and the reference), generate_haptic_command and
+adjust_commands_for_dot per call over the corpus sentences.
+"""
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import final_emotion_analysis as fea
+
+STUB_LABELS = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+
+DEFAULT_SCALES = [1, 10, 100]
+
+# Relative change that counts as a regression: throughput down, or memory / output size up.
+DEFAULT_TOLERANCE = 0.10
+
+
+class StubClassifier:
+    """Stands in for the transformers pipeline: label scores derived from an MD5 of the sentence."""
+
+    def _scores(self, sentence):
+        digest = hashlib.md5(sentence.encode("utf-8")).digest()
+        raw = [byte + 1 for byte in digest[:len(STUB_LABELS)]]
+        total = sum(raw)
+        return [{"label": label, "score": value / total} for label, value in zip(STUB_LABELS, raw)]
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        if isinstance(inputs, str):
+            return [self._scores(inputs)]
+        return [self._scores(sentence) for sentence in inputs]
+
+
+def synthetic_corpus(text_files, scale, folder, seed=0):
+    """Write scale copies of every text into folder and return the new paths."""
+    rng = random.Random(seed)
+    paths = []
+    for text_file in text_files:
+        with open(text_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        sentences = fea.sent_tokenize(text)
+        parts = [text]
+        for _ in range(scale - 1):
+            shuffled = []
+            for sentence in sentences:
+                words = sentence.split()
+                rng.shuffle(words)
+                shuffled.append(" ".join(words))
+            parts.append(" ".join(shuffled))
+        path = os.path.join(folder, os.path.basename(text_file))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(parts))
+        paths.append(path)
+    return paths
+
+
+def run_pipeline(paths, work_folder, formats):
+    """Score and write every file with a cold cache. Returns (sentences, bytes written)."""
+    output_folder = os.path.join(work_folder, "out")
+    shutil.rmtree(output_folder, ignore_errors=True)
+    os.makedirs(output_folder)
+    engine = fea.EmotionEngine(cache_path=os.path.join(work_folder, "cache", "scores.sqlite3"),
+                               classifier=StubClassifier())
+    sentences = 0
+    try:
+        # The writers print every file they save; stdout is kept for the JSON results.
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in paths:
+                sentence_table, records = fea.analyze_file(path, engine)
+                fea.write_haptic_outputs(records, os.path.basename(path), output_folder, formats, sentence_table)
+                sentences += len(sentence_table)
+    finally:
+        engine.close()
+        shutil.rmtree(os.path.join(work_folder, "cache"), ignore_errors=True)
+    output_bytes = sum(os.path.getsize(os.path.join(output_folder, name)) for name in os.listdir(output_folder))
+    return sentences, output_bytes
+
+
+def measure(paths, work_folder, formats, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        sentences, output_bytes = run_pipeline(paths, work_folder, formats)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    # Memory is traced in a separate run so tracemalloc's overhead does not skew the timings.
+    tracemalloc.start()
+    run_pipeline(paths, work_folder, formats)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "files": len(paths),
+        "sentences": sentences,
+        "seconds": round(best, 4),
+        "sentences_per_s": round(sentences / best, 1) if best else None,
+        "peak_memory_bytes": peak,
+        "output_bytes": output_bytes
+    }
+
+
+def _per_call_us(function, items, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / max(len(items), 1) * 1e6, 3)
+
+
+def component_timings(text_files, repeat):
+    """Microseconds per call of the individual pipeline functions over the corpus sentences."""
+    sentences = []
+    for text_file in text_files:
+        with open(text_file, "r", encoding="utf-8") as f:
+            sentences.extend(fea.sent_tokenize(f.read()))
+    token_lists = [fea.word_tokenize(sentence.lower()) for sentence in sentences]
+    tokenized = [fea.tokenize_words(sentence)[0] for sentence in sentences]
+    matcher = fea.get_lexicon_matcher()
+
+    filtered = []
+    for sentence in sentences:
+        scores = fea.blend_scores(fea.rule_based_score(sentence),
+                                  fea.map_ml_scores([[r["label"], r["score"]] for r in StubClassifier()(sentence)[0]]))
+        normalized = fea.normalize_and_threshold(scores, threshold=0.05)
+        if normalized:
+            filtered.append(normalized)
+    commands = [fea.generate_haptic_command(scores, fea.haptic_mapping, weight_threshold=0.1) for scores in filtered]
+
+    def adjust_all(base_commands):
+        for position in fea.DOT_POSITIONS:
+            fea.adjust_commands_for_dot(base_commands, position)
+
+    return {
+        "sentences": len(sentences),
+        "tokenize_words_us": _per_call_us(fea.tokenize_words, sentences, repeat),
+        "rule_based_score_us": _per_call_us(fea.rule_based_score, sentences, repeat),
+        "lexicon_score_tokens_us": _per_call_us(matcher.score, tokenized, repeat),
+        "score_single_words_us": _per_call_us(
+            lambda tokens: fea.score_single_words(tokens, fea.emotion_categories), token_lists, repeat),
+        "score_multi_word_expressions_us": _per_call_us(
+            lambda sentence: fea.score_multi_word_expressions(sentence, fea.mwe_expressions), sentences, repeat),
+        "generate_haptic_command_us": _per_call_us(
+            lambda scores: fea.generate_haptic_command(scores, fea.haptic_mapping, weight_threshold=0.1),
+            filtered, repeat),
+        "adjust_commands_for_dots_us": _per_call_us(adjust_all, commands, repeat)
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regression messages for results against baseline (same structure as run_benchmarks output)."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous.get("sentences_per_s") and current["sentences_per_s"] < previous["sentences_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['sentences_per_s']} sentences/s "
+                               f"(baseline {previous['sentences_per_s']})")
+        for key in ("peak_memory_bytes", "output_bytes"):
+            if previous.get(key) and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {current[key]} (baseline {previous[key]})")
+    for key, value in results.get("components", {}).items():
+        previous = baseline.get("components", {}).get(key)
+        if key.endswith("_us") and previous and value > previous * (1 + tolerance):
+            regressions.append(f"components: {key} {value} (baseline {previous})")
+    return regressions
+
+
+def run_benchmarks(text_files, scales=DEFAULT_SCALES, formats=fea.HAPTIC_FORMATS, repeat=3):
+    work_folder = tempfile.mkdtemp(prefix="emotion-benchmark-")
+    try:
+        results = {"formats": list(formats), "scenarios": {}}
+        for scale in scales:
+            name = "corpus" if scale == 1 else f"{scale}x"
+            if scale == 1:
+                paths = text_files
+            else:
+                folder = os.path.join(work_folder, name)
+                os.makedirs(folder)
+                paths = synthetic_corpus(text_files, scale, folder)
+            # Large scenarios are slow enough that a single timed run is representative.
+            results["scenarios"][name] = measure(paths, work_folder, formats, repeat if scale < 100 else 1)
+            print(f"{name:>8}: {results['scenarios'][name]}", file=sys.stderr)
+        results["components"] = component_timings(text_files, repeat)
+        return results
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the emotion analysis pipeline with a stub classifier.")
+    parser.add_argument("--texts", default=fea.input_folder, help="Folder of .txt files to benchmark.")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="Comma-separated corpus multipliers (1 is the corpus itself).")
+    parser.add_argument("--format", choices=["track", "json", "jsonl", "both"], default="track",
+                        help="Haptic output format to write, as in final_emotion_analysis.py.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario; the best is reported.")
+    parser.add_argument("--baseline", help="Results file to compare against.")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to PATH.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed relative slowdown or growth before a result counts as a regression.")
+    args = parser.parse_args(argv)
+
+    text_files = sorted(glob.glob(os.path.join(args.texts, "*.txt")))
+    if not text_files:
+        parser.error(f"No .txt files in {args.texts}")
+    formats = ("track", "json") if args.format == "both" else (args.format,)
+    scales = [int(scale) for scale in args.scales.split(",") if scale]
+
+    results = run_benchmarks(text_files, scales, formats, args.repeat)
+    print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.", file=sys.stderr)
+            return 0
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# classifier_backends.py
+"""
+Interchangeable implementations of the emotion classifier.
+
+Every backend is called like a transformers text-classification pipeline with
+return_all_scores=True, which is what EmotionEngine expects:
+
+    backend("One sentence.")            -> [[{"label": ..., "score": ...}, ...]]
+    backend([s1, s2], batch_size=2)     -> [[...], [...]]
+
+and exposes .tokenizer. classify_encoded(features) scores token ids the engine has already
+tokenized: features maps tokenizer output names (input_ids, attention_mask, ...) to one list
+per sentence, all of the same length, so no padding is involved.
+
+    pipeline    the reference: transformers.pipeline at full precision
+    quantized   the same model with its Linear layers dynamically quantized to int8 (CPU)
+    onnx        an exported graph (model.onnx in the model directory) run by onnxruntime
+
+Models are loaded from model_id, a local directory (or a Hugging Face id where the backend
+allows it). Create the ONNX graph once with:
+
+    python classifier_backends.py export MODEL_DIR
+
+parity_report() compares a backend against the reference, label by label.
+"""
+import os
+import sys
+import time
+
+BACKEND_NAMES = ("pipeline", "quantized", "onnx")
+ONNX_FILE = "model.onnx"
+
+
+def _softmax_rows(logits):
+    import numpy as np
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+class ClassifierBackend:
+    """
+    Shared batching: subclasses implement _forward(features) -> rows of label probabilities,
+    where features are tokenizer outputs as tensor_type arrays.
+    """
+
+    name = None
+    tensor_type = None
+
+    def __init__(self, tokenizer, labels):
+        self.tokenizer = tokenizer
+        self.labels = labels
+
+    def _forward(self, features):
+        raise NotImplementedError
+
+    def _results(self, rows):
+        return [[{"label": label, "score": float(score)} for label, score in zip(self.labels, row)] for row in rows]
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        sentences = [inputs] if isinstance(inputs, str) else list(inputs)
+        batch_size = batch_size or len(sentences) or 1
+        results = []
+        for start in range(0, len(sentences), batch_size):
+            encoded = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                     return_tensors=self.tensor_type)
+            results.extend(self._results(self._forward(encoded)))
+        return results
+
+    def classify_encoded(self, features):
+        from transformers import BatchEncoding
+        return self._results(self._forward(BatchEncoding(dict(features), tensor_type=self.tensor_type)))
+
+
+class PipelineBackend:
+    """The full-precision transformers pipeline, unchanged."""
+
+    name = "pipeline"
+
+    def __init__(self, model_id):
+        from transformers import pipeline
+        self._pipeline = pipeline("text-classification", model=model_id, return_all_scores=True)
+        self.tokenizer = getattr(self._pipeline, "tokenizer", None)
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        if batch_size is not None:
+            kwargs["batch_size"] = batch_size
+        return self._pipeline(inputs, **kwargs)
+
+    def classify_encoded(self, features):
+        """The pipeline's forward pass and postprocessing, on token ids tokenized elsewhere."""
+        import torch
+        pipe = self._pipeline
+        inputs = {name: torch.tensor(values, device=pipe.device) for name, values in features.items()}
+        with torch.inference_mode():
+            logits = pipe.model(**inputs).logits
+        # One row at a time, exactly as the pipeline postprocesses a single sentence.
+        return [pipe.postprocess({"logits": logits[i:i + 1]}, **pipe._postprocess_params) for i in range(len(logits))]
+
+
+class QuantizedBackend(ClassifierBackend):
+    """Dynamic int8 quantization of the Linear layers; weights are converted once at load time."""
+
+    name = "quantized"
+    tensor_type = "pt"
+
+    def __init__(self, model_id):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        model = AutoModelForSequenceClassification.from_pretrained(model_id)
+        model.eval()
+        self._torch = torch
+        self._model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+        super().__init__(AutoTokenizer.from_pretrained(model_id), labels)
+
+    def classify_encoded(self, features):
+        # Dynamic quantization scales activations over the whole batch, so only a batch of one
+        # gives the same scores as classifying the sentence on its own.
+        results = []
+        for i in range(len(features["input_ids"])):
+            results.extend(super().classify_encoded({name: values[i:i + 1] for name, values in features.items()}))
+        return results
+
+    def _forward(self, features):
+        with self._torch.inference_mode():
+            logits = self._model(**features).logits
+        return self._torch.softmax(logits, dim=-1).numpy()
+
+
+class OnnxBackend(ClassifierBackend):
+    """Runs model_id/model.onnx (see export_onnx) with onnxruntime on the CPU."""
+
+    name = "onnx"
+    tensor_type = "np"
+
+    def __init__(self, model_id):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+        path = os.path.join(model_id, ONNX_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No exported graph at {path}; run: python classifier_backends.py export {model_id}")
+        config = AutoConfig.from_pretrained(model_id)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._session.get_inputs()}
+        labels = [config.id2label[i] for i in range(config.num_labels)]
+        super().__init__(AutoTokenizer.from_pretrained(model_id), labels)
+
+    def _forward(self, features):
+        feed = {name: features[name].astype("int64") for name in self._inputs if name in features}
+        (logits,) = self._session.run(["logits"], feed)
+        return _softmax_rows(logits)
+
+
+BACKENDS = {
+    "pipeline": PipelineBackend,
+    "quantized": QuantizedBackend,
+    "onnx": OnnxBackend
+}
+
+
+def load_backend(name, model_id):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend {name!r}; choose from {', '.join(BACKEND_NAMES)}")
+    return BACKENDS[name](model_id)
+
+
+def export_onnx(model_dir, output_path=None):
+    """Export the sequence-classification model in model_dir to an ONNX graph with dynamic batch and length."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    output_path = output_path or os.path.join(model_dir, ONNX_FILE)
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    model.eval()
+    model.config.return_dict = False
+    sample = AutoTokenizer.from_pretrained(model_dir)(["An example sentence."], return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    torch.onnx.export(
+        model, (sample["input_ids"], sample["attention_mask"]), output_path,
+        input_names=["input_ids", "attention_mask"], output_names=["logits"],
+        dynamic_axes={"input_ids": axes, "attention_mask": axes, "logits": {0: "batch"}},
+        opset_version=14
+    )
+    return output_path
+
+
+def parity_report(reference, candidate, sentences, batch_size=32):
+    """
+    Score drift of candidate against reference over sentences.
+    - labels: per label, the mean and max absolute score difference.
+    - top_label_agreement: share of sentences whose highest-scoring label is the same.
+    - *_ms_per_sentence: wall time of each run divided by the sentence count.
+    """
+    started = time.perf_counter()
+    expected = reference(sentences, batch_size=batch_size)
+    reference_s = time.perf_counter() - started
+    started = time.perf_counter()
+    actual = candidate(sentences, batch_size=batch_size)
+    candidate_s = time.perf_counter() - started
+    drift = {}
+    agree = 0
+    for want, got in zip(expected, actual):
+        got_scores = {result["label"].lower(): result["score"] for result in got}
+        for result in want:
+            label = result["label"].lower()
+            drift.setdefault(label, []).append(abs(result["score"] - got_scores.get(label, 0.0)))
+        top_want = max(want, key=lambda r: r["score"])["label"].lower()
+        top_got = max(got, key=lambda r: r["score"])["label"].lower()
+        agree += top_want == top_got
+    return {
+        "sentences": len(sentences),
+        "top_label_agreement": round(agree / len(sentences), 4) if sentences else None,
+        "reference_ms_per_sentence": round(reference_s / max(len(sentences), 1) * 1000, 3),
+        "candidate_ms_per_sentence": round(candidate_s / max(len(sentences), 1) * 1000, 3),
+        "labels": {
+            label: {"mean_abs": round(sum(values) / len(values), 6), "max_abs": round(max(values), 6)}
+            for label, values in drift.items()
+        }
+    }
+
+
+if __name__ == "__main__":
+    # python classifier_backends.py export MODEL_DIR [OUTPUT.onnx]
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        print("Usage: python classifier_backends.py export MODEL_DIR [OUTPUT.onnx]")
+        sys.exit(2)
+    print(f"Graph saved to {export_onnx(*sys.argv[2:4])}")
@@ -0,0 +1,371 @@
+# device_pool.py
+"""
+One narration driving many readers' DataFeel dots, for classroom sessions.
+
+A session is one reader's set of dots, given as physical addresses in dot_position_mapping
+order (right wrist, right temple, left temple, left wrist). Playback frames address the reader
+dots 1-4; every session translates them to its own dots.
+
+- One asyncio loop on a background thread does all routing; send() only hands it the frame,
+  so the UI thread never waits on a device.
+- Every session has its own queue holding at most one frame. A session that falls behind has
+  its queued frame replaced by the newer one (counted as coalesced) instead of building a
+  backlog, so it never plays stale haptics and never holds up the other sessions.
+- Every dot has its own writer thread and, as DotWriter does, only writes registers that
+  changed. While a write is in flight, newer states for that dot are merged into one pending
+  state. A write that raises or takes longer than write_timeout marks the dot offline; no
+  other dot, in the same session or not, waits for it.
+- Offline dots (and configured dots that were never found) are looked for in the background
+  every reconnect_interval; a dot that comes back is brought up to its session's latest state.
+
+Load test with simulated dots, e.g. 32 dots in 8 sessions with three slow dots and two that
+drop out and come back:
+
+    python device_pool.py --dots 32 --slow 3 --unplug 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from haptic_output import RESET_STATE, DotState, SimulatedBus, diff_state, write_changes
+from instrumentation import metrics
+
+# Addresses of one reader's dots as used by playback frames (dot_position_mapping values).
+READER_ADDRESSES = (1, 2, 3, 4)
+
+MAX_DOTS = 64
+WRITE_TIMEOUT_S = 0.5
+RECONNECT_INTERVAL_S = 2.0
+
+# Most recent write latencies kept per dot for report().
+LATENCY_SAMPLES = 1000
+
+
+def parse_sessions(spec):
+    """
+    Session layout from a string such as "1,2,3,4;5,6,7,8" (one reader per group). "auto" (or
+    an empty spec) returns None: discovered dots are grouped into readers by address order.
+    """
+    if not spec or spec.strip().lower() == "auto":
+        return None
+    return [[int(address) for address in group.split(",") if address.strip()]
+            for group in spec.split(";") if group.strip()]
+
+
+def group_sessions(addresses, size=len(READER_ADDRESSES)):
+    """Split addresses, in ascending order, into readers of size dots (the last may have fewer)."""
+    ordered = sorted(addresses)
+    return [ordered[i:i + size] for i in range(0, len(ordered), size)]
+
+
+def _merge(pending, target):
+    """pending updated with the fields target sets."""
+    if pending is None:
+        return target
+    return pending._replace(**{field: value for field, value in zip(DotState._fields, target) if value is not None})
+
+
+def _p95(samples):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2) if ordered else None
+
+
+class DotLink:
+    """One connected dot: its writer thread, the state last written and the state waiting to be."""
+
+    def __init__(self, device):
+        self.device = device
+        self.address = device.id
+        self.online = True
+        self.last = DotState()
+        self.pending = None
+        self.pending_since = None
+        self.task = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"dot-{self.address}")
+        self.writes = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        # Seconds from a state being routed to this dot until it was written.
+        self.lags = deque(maxlen=LATENCY_SAMPLES)
+
+    def close(self):
+        # A write stuck on a dead link must not block shutdown.
+        self.executor.shutdown(wait=False)
+
+
+class Session:
+    def __init__(self, name, addresses):
+        self.name = name
+        self.addresses = list(addresses)
+        self.routes = dict(zip(READER_ADDRESSES, self.addresses))
+        self.queue = asyncio.Queue(maxsize=1)
+        # Latest state routed to each of the session's dots, for dots that reconnect.
+        self.latest = {}
+        self.stats = {"frames": 0, "coalesced": 0}
+
+
+class DevicePool:
+    """
+    Fans playback frames out to reader sessions (see the module docstring). Has the same
+    interface as DotWriter (set_devices, send, reset, wait, close, devices), so the reader can
+    use either.
+    - sessions: list of address lists, one per reader; None groups discovered dots by address.
+    - discover: callable(max_dots) -> devices used to find dropped dots again; None disables
+      reconnecting.
+    """
+
+    def __init__(self, sessions=None, discover=None, max_dots=MAX_DOTS, write_timeout=WRITE_TIMEOUT_S,
+                 reconnect_interval=RECONNECT_INTERVAL_S):
+        self.session_layout = sessions
+        self.discover = discover
+        self.max_dots = max_dots
+        self.write_timeout = write_timeout
+        self.reconnect_interval = reconnect_interval
+        self.links = {}
+        self.sessions = []
+        self.stats = {"frames": 0, "failures": 0, "reconnects": 0}
+        self._tasks = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="device-pool", daemon=True)
+        self._thread.start()
+
+    # ---- Caller thread API ----
+    @property
+    def devices(self):
+        return {address: link.device for address, link in list(self.links.items()) if link.online}
+
+    def set_devices(self, devices):
+        self._call(self._set_devices(list(devices)))
+
+    def send(self, targets):
+        """Queue a frame {reader address: DotState} for every session. Returns the session count."""
+        self.stats["frames"] += 1
+        self._loop.call_soon_threadsafe(self._route, dict(targets))
+        return len(self.sessions)
+
+    def reset(self):
+        """Stop vibration and turn off the LEDs on every reader's dots."""
+        return self.send({address: RESET_STATE for address in READER_ADDRESSES})
+
+    def wait(self, timeout=None):
+        """Block until every queued frame has been written or given up on (for tests and load tests)."""
+        self._call(self._idle(), timeout)
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._call(self._stop())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def report(self):
+        """Per-session and per-dot delivery statistics."""
+        sessions = {}
+        for session in self.sessions:
+            links = [self.links[address] for address in session.addresses if address in self.links]
+            sessions[session.name] = {
+                **session.stats,
+                "dots": session.addresses,
+                "online": sum(link.online for link in links),
+                "lag_p95_ms": _p95([lag for link in links for lag in link.lags])
+            }
+        dots = {
+            address: {"online": link.online, "writes": link.writes, "write_p95_ms": _p95(link.latencies),
+                      "lag_p95_ms": _p95(link.lags)}
+            for address, link in sorted(self.links.items())
+        }
+        return {"pool": dict(self.stats), "sessions": sessions, "dots": dots}
+
+    def _call(self, coroutine, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    # ---- Pool loop ----
+    async def _set_devices(self, devices):
+        await self._stop()
+        self.links = {device.id: DotLink(device) for device in devices}
+        layout = self.session_layout or group_sessions(self.links)
+        self.sessions = [Session(f"reader-{i + 1}", addresses) for i, addresses in enumerate(layout)]
+        self._tasks = [asyncio.create_task(self._run_session(session)) for session in self.sessions]
+        if self.discover is not None:
+            self._tasks.append(asyncio.create_task(self._reconnect()))
+
+    async def _stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for link in self.links.values():
+            link.close()
+
+    def _route(self, targets):
+        for session in self.sessions:
+            if session.queue.full():
+                session.queue.get_nowait()
+                session.stats["coalesced"] += 1
+            session.queue.put_nowait(targets)
+
+    async def _run_session(self, session):
+        while True:
+            targets = await session.queue.get()
+            session.stats["frames"] += 1
+            for reader_address, target in targets.items():
+                address = session.routes.get(reader_address)
+                if address is None:
+                    continue
+                session.latest[address] = _merge(session.latest.get(address), target)
+                link = self.links.get(address)
+                if link is not None and link.online:
+                    self._submit(link, target)
+
+    def _submit(self, link, target):
+        if link.pending is None:
+            link.pending_since = time.perf_counter()
+        link.pending = _merge(link.pending, target)
+        if link.task is None:
+            link.task = asyncio.create_task(self._drain(link))
+
+    async def _drain(self, link):
+        """Write the dot's pending state until there is none; newer states merge in meanwhile."""
+        loop = asyncio.get_running_loop()
+        try:
+            while link.pending is not None and link.online:
+                target, since = link.pending, link.pending_since
+                link.pending = None
+                changes = diff_state(link.last, target)
+                if not changes:
+                    continue
+                try:
+                    elapsed = await asyncio.wait_for(
+                        loop.run_in_executor(link.executor, write_changes, link.device, changes), self.write_timeout)
+                except Exception as e:
+                    self._drop(link, e)
+                    return
+                link.last = link.last._replace(**dict(changes))
+                link.writes += len(changes)
+                link.latencies.append(elapsed)
+                link.lags.append(time.perf_counter() - since)
+                metrics.record("device_write", elapsed)
+        finally:
+            link.task = None
+
+    def _drop(self, link, error):
+        link.online = False
+        link.pending = None
+        link.close()
+        self.stats["failures"] += 1
+        reason = "timed out" if isinstance(error, asyncio.TimeoutError) else repr(error)
+        print(f"⚠️ Dot {link.address} dropped ({reason}); reconnecting in the background.", file=sys.stderr)
+
+    def _missing(self):
+        return {address for session in self.sessions for address in session.addresses
+                if address not in self.links or not self.links[address].online}
+
+    async def _reconnect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reconnect_interval)
+            missing = self._missing()
+            if not missing:
+                continue
+            try:
+                devices = await loop.run_in_executor(None, self.discover, self.max_dots)
+            except Exception as e:
+                print(f"⚠️ Device discovery failed: {e!r}", file=sys.stderr)
+                continue
+            for device in devices:
+                if device.id not in missing:
+                    continue
+                link = self.links[device.id] = DotLink(device)
+                self.stats["reconnects"] += 1
+                print(f"🔌 Dot {device.id} reconnected.", file=sys.stderr)
+                for session in self.sessions:
+                    if device.id in session.latest:
+                        self._submit(link, session.latest[device.id])
+
+    async def _idle(self):
+        while (any(not session.queue.empty() for session in self.sessions)
+               or any(link.task is not None for link in self.links.values())):
+            await asyncio.sleep(0.005)
+
+
+# ---------------------------
+# Load test with simulated dots
+# ---------------------------
+def random_frame(rng):
+    return {
+        address: DotState(
+            vibration_mode=1,
+            vibration_intensity=round(rng.random(), 2),
+            vibration_frequency=rng.choice([100, 150, 200, 250]),
+            thermal_intensity=round(rng.uniform(-1, 1), 2),
+            led=(rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+        )
+        for address in READER_ADDRESSES
+    }
+
+
+def load_test(dots=32, frames=300, interval=0.05, write_latency=0.002, slow=0, slow_latency=0.03, unplug=0,
+              write_timeout=WRITE_TIMEOUT_S, reconnect_interval=0.5, seed=0):
+    """
+    Play frames random frames, one every interval, to simulated dots in readers of four.
+    - slow dots take slow_latency per register write (dots 1, 5, 9, ...: one per reader).
+    - unplug dots are disconnected a third of the way in and plugged back at two thirds.
+    Returns DevicePool.report() plus the frames that were sent.
+    """
+    bus = SimulatedBus(dots, write_latency)
+    for address in range(1, slow * len(READER_ADDRESSES) + 1, len(READER_ADDRESSES)):
+        bus.dots[address].write_latency = slow_latency
+    # Unplugged dots are taken from the end, so they do not overlap the slow ones.
+    unplugged = list(range(dots, dots - unplug, -1))
+    pool = DevicePool(discover=bus.discover, max_dots=dots, write_timeout=write_timeout,
+                      reconnect_interval=reconnect_interval)
+    rng = random.Random(seed)
+    try:
+        pool.set_devices(bus.discover(dots))
+        started = time.perf_counter()
+        for frame in range(frames):
+            if frame == frames // 3:
+                for address in unplugged:
+                    bus.unplug(address)
+            elif frame == 2 * frames // 3:
+                for address in unplugged:
+                    bus.plug(address)
+            pool.send(random_frame(rng))
+            time.sleep(max(0.0, started + (frame + 1) * interval - time.perf_counter()))
+        # Give plugged-back dots a chance to be found before reporting.
+        time.sleep(reconnect_interval * 2)
+        pool.wait(timeout=30)
+        return {"frames_sent": frames, **pool.report()}
+    finally:
+        pool.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the device pool with simulated DataFeel dots.")
+    parser.add_argument("--dots", type=int, default=32, help="Simulated dots, grouped into readers of four.")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--interval-ms", type=float, default=50, help="Time between frames.")
+    parser.add_argument("--write-latency-ms", type=float, default=2, help="Per-register write time of a dot.")
+    parser.add_argument("--slow", type=int, default=0, help="Dots with --slow-latency-ms writes (one per reader).")
+    parser.add_argument("--slow-latency-ms", type=float, default=30)
+    parser.add_argument("--unplug", type=int, default=0, help="Dots that drop out and come back during the run.")
+    parser.add_argument("--write-timeout-ms", type=float, default=WRITE_TIMEOUT_S * 1000)
+    args = parser.parse_args(argv)
+
+    report = load_test(
+        dots=args.dots, frames=args.frames, interval=args.interval_ms / 1000,
+        write_latency=args.write_latency_ms / 1000, slow=args.slow, slow_latency=args.slow_latency_ms / 1000,
+        unplug=args.unplug, write_timeout=args.write_timeout_ms / 1000
+    )
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,93 @@
 # final_emotion_analysis.py
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 import json
-import nltk
-import matplotlib.pyplot as plt
-from nltk.tokenize import sent_tokenize, word_tokenize
-from transformers import pipeline
+import hashlib
+import math
+import argparse
+from collections import namedtuple
+from score_cache import ScoreCache, fingerprint
+from lexicon_matcher import LexiconMatcher
+from haptic_track import HapticTrack, TRACK_SUFFIX
+from instrumentation import metrics
+from classifier_backends import BACKEND_NAMES, load_backend, parity_report
+
+# Import is kept cheap: NLTK, transformers and matplotlib are only loaded on first use.
+STARTUP_TIMINGS = {}
 
-# Download necessary NLTK resources
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('averaged_perceptron_tagger_eng')
+# Never download anything; rely on local NLTK data and model files (also set by --offline).
+OFFLINE = os.environ.get("EMOTION_ANALYSIS_OFFLINE") == "1"
+
+# ---------------------------
+# 0. Lazily Loaded NLTK Tokenizers
+# ---------------------------
+# Only the Punkt sentence model is needed: newer NLTK releases read "punkt_tab", older ones "punkt".
+NLTK_RESOURCES = ["punkt", "punkt_tab"]
+_nltk_tokenizers = None
+
+def load_nltk_tokenizers(offline=None):
+    """
+    Return (sent_tokenize, word_tokenize), downloading Punkt data only if it is missing.
+    - The check loads the tokenizer from local data first, so no network is touched when
+      the data is already installed.
+    - With offline=True a missing resource raises LookupError instead of downloading.
+    """
+    global _nltk_tokenizers
+    if _nltk_tokenizers is not None:
+        return _nltk_tokenizers
+    offline = OFFLINE if offline is None else offline
+    started = time.perf_counter()
+    from nltk.tokenize import sent_tokenize as nltk_sent_tokenize, word_tokenize as nltk_word_tokenize
+    try:
+        nltk_sent_tokenize("Checking resources. Done.")
+    except LookupError:
+        if offline:
+            raise
+        import nltk
+        for resource in NLTK_RESOURCES:
+            nltk.download(resource, quiet=True)
+        nltk_sent_tokenize("Checking resources. Done.")
+    _nltk_tokenizers = (nltk_sent_tokenize, nltk_word_tokenize)
+    STARTUP_TIMINGS["nltk_load_s"] = time.perf_counter() - started
+    return _nltk_tokenizers
+
+def sent_tokenize(text):
+    with metrics.stage("sent_tokenize"):
+        return load_nltk_tokenizers()[0](text)
+
+def word_tokenize(text):
+    return load_nltk_tokenizers()[1](text)
+
+_word_tokenizer = None
+
+def tokenize_words(sentence, offset=0):
+    """
+    Lowercased word tokens of one sentence and the [start, end) of each in the text the sentence
+    starts at offset in. Unlike word_tokenize, this does not split the sentence with Punkt again.
+    """
+    global _word_tokenizer
+    if _word_tokenizer is None:
+        from nltk.tokenize import NLTKWordTokenizer
+        _word_tokenizer = NLTKWordTokenizer()
+    try:
+        relative = list(_word_tokenizer.span_tokenize(sentence))
+        tokens = [sentence[start:end].lower() for start, end in relative]
+    except ValueError:
+        # Tokens that cannot be aligned with the text (rare quote combinations) get a zero-width span.
+        tokens, relative, position = [], [], 0
+        for token in _word_tokenizer.tokenize(sentence):
+            start = sentence.find(token, position)
+            if start == -1:
+                relative.append((position, position))
+            else:
+                position = start + len(token)
+                relative.append((start, position))
+            tokens.append(token.lower())
+    spans = [(offset + start, offset + end) for start, end in relative]
+    return tokens, spans
 
 # ---------------------------
 # DataFeel API Mappings
@@ -137,16 +215,46 @@ def merge_scores(single_scores, mwe_scores):
         merged[emotion] = single_scores.get(emotion, 0.0) + mwe_scores.get(emotion, 0.0)
     return merged
 
-def rule_based_score(sentence):
+def reference_rule_based_score(sentence):
+    """Uncompiled rule scorer; the reference tests/test_lexicon_matcher.py checks LexiconMatcher against."""
     words = word_tokenize(sentence.lower())
     single_word_scores = score_single_words(words, emotion_categories)
     mwe_scores = score_multi_word_expressions(sentence, mwe_expressions)
     return merge_scores(single_word_scores, mwe_scores)
 
+_lexicon_matcher = None
+
+def get_lexicon_matcher():
+    """Compile emotion_categories and mwe_expressions (tokenized like sentences) on first use."""
+    global _lexicon_matcher
+    if _lexicon_matcher is None:
+        phrases = {
+            emotion: [tuple(tokenize_words(phrase)[0]) for phrase in phrase_list]
+            for emotion, phrase_list in mwe_expressions.items()
+        }
+        _lexicon_matcher = LexiconMatcher(
+            emotion_categories, phrases, intensifiers, negators, WINDOW_SIZE, MWE_BASE_SCORE
+        )
+    return _lexicon_matcher
+
+def rule_based_score(sentence, tokens=None):
+    """Rule scores of a sentence; pass its tokens from sentence_spans to skip tokenizing it again."""
+    if tokens is None:
+        tokens = tokenize_words(sentence)[0]
+    with metrics.stage("rule_based_score"):
+        return get_lexicon_matcher().score(tokens)
+
+# Anything that changes rule scores must be part of this fingerprint so cached entries miss.
+# Bump RULE_SCORER_VERSION when the scoring code itself changes.
+RULE_SCORER_VERSION = 3
+RULE_FINGERPRINT = fingerprint(
+    RULE_SCORER_VERSION, emotion_categories, mwe_expressions, intensifiers, negators, WINDOW_SIZE, MWE_BASE_SCORE
+)
+
 # ---------------------------
 # 4. Set Up ML Emotion Classifier
 # ---------------------------
-ml_classifier = pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True)
+ML_MODEL_ID = "j-hartmann/emotion-english-distilroberta-base"
 ml_to_rule_mapping = {
     "anger": {"Guilt": 0.6, "Regret": 0.4},
     "disgust": {"Guilt": 0.5, "Regret": 0.5},
@@ -157,31 +265,323 @@ ml_to_rule_mapping = {
     "neutral": {}
 }
 
-def get_ml_scores(sentence):
-    results = ml_classifier(sentence)[0]
+def map_ml_scores(label_scores):
     ml_scores = {emotion: 0.0 for emotion in emotion_categories}
-    for result in results:
-        label = result['label'].lower()
-        score = result['score']
+    for label, score in label_scores:
         mapping = ml_to_rule_mapping.get(label, {})
         for rule_emotion, weight in mapping.items():
             ml_scores[rule_emotion] += score * weight
     return ml_scores
 
+# Sentences per forward pass for the batched path.
+ML_BATCH_SIZE = 32
+
+# Classifier implementation (see classifier_backends.py); "pipeline" is the full-precision reference.
+ML_BACKEND = "pipeline"
+
+# Rule scores are keyed by the lexicon fingerprint and classifier output by the model id.
+# The classifier entry holds the raw label scores, so editing ml_to_rule_mapping needs no rerun.
+CACHE_PATH = os.path.join(".cache", "sentence_scores.sqlite3")
+CACHE_MAX_BYTES = 256 * 1024 * 1024
 # ---------------------------
 # 5. Blending Function
 # ---------------------------
 ALPHA = 0.5
 def blend_scores(rule_scores, ml_scores, alpha=ALPHA):
     blended = {}
-    for emotion in set(list(rule_scores.keys()) + list(ml_scores.keys())):
+    # dict.fromkeys keeps first-seen order, so output key order does not depend on the hash seed.
+    for emotion in dict.fromkeys(list(rule_scores.keys()) + list(ml_scores.keys())):
         blended[emotion] = alpha * rule_scores.get(emotion, 0.0) + (1 - alpha) * ml_scores.get(emotion, 0.0)
     return blended
 
+# Cascade mode: the classifier only runs on sentences whose rule scores are not decisive.
+# A sentence is decisive when its top rule score reaches CASCADE_MIN_SCORE and the runner-up
+# trails by at least CASCADE_MARGIN (relative to the top); optionally the normalized entropy
+# of the rule scores must also be at most CASCADE_MAX_ENTROPY. Everything else, including
+# sentences without lexicon hits, goes to the classifier.
+CASCADE_MARGIN = 0.5
+CASCADE_MIN_SCORE = 1.0
+CASCADE_MAX_ENTROPY = None
+
+def rule_entropy(rule_scores):
+    """Entropy of the positive rule scores as a distribution, scaled to 0..1."""
+    values = [v for v in rule_scores.values() if v > 0]
+    total = sum(values)
+    if len(values) < 2 or len(rule_scores) < 2:
+        return 0.0
+    entropy = -sum(v / total * math.log(v / total) for v in values)
+    return entropy / math.log(len(rule_scores))
+
+def is_decisive(rule_scores, margin=CASCADE_MARGIN, min_score=CASCADE_MIN_SCORE, max_entropy=CASCADE_MAX_ENTROPY):
+    ranked = sorted(rule_scores.values(), reverse=True)
+    if not ranked or ranked[0] < min_score:
+        return False
+    runner_up = ranked[1] if len(ranked) > 1 else 0.0
+    if margin is not None and (ranked[0] - runner_up) / ranked[0] < margin:
+        return False
+    return max_entropy is None or rule_entropy(rule_scores) <= max_entropy
+
+# ---------------------------
+# 5.5 Emotion Engine – Classifier and Score Cache, Created on First Use
+# ---------------------------
+class EmotionEngine:
+    """
+    Scores sentences with the rule lexicons and the transformer classifier.
+    - The classifier and the score cache are created on first use, so constructing an
+      engine costs nothing; load() does it eagerly and reports the time taken.
+    - Rule scores and raw classifier output are cached per sentence (see score_cache.py).
+    - backend picks the classifier implementation; outputs of other backends than the
+      reference pipeline are cached and fingerprinted under their own classifier_id.
+    - With cascade=True, final_scores only classifies sentences whose rule scores are not
+      decisive (see is_decisive); the rest are blended with an empty classifier result.
+      cascade_stats counts the sentences that took each path.
+    - classifier may be given ready-made (anything called like a transformers text-classification
+      pipeline with return_all_scores=True), e.g. the deterministic stub in benchmark.py.
+    """
+
+    def __init__(self, model_id=ML_MODEL_ID, cache_path=CACHE_PATH, cache_max_bytes=CACHE_MAX_BYTES,
+                 batch_size=ML_BATCH_SIZE, backend=ML_BACKEND, cascade=False, cascade_margin=CASCADE_MARGIN,
+                 cascade_max_entropy=CASCADE_MAX_ENTROPY, classifier=None):
+        self.model_id = model_id
+        self.backend = backend
+        self.cascade = cascade
+        self.cascade_margin = cascade_margin
+        self.cascade_max_entropy = cascade_max_entropy
+        self.cascade_stats = {"rule_only": 0, "classifier": 0}
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.batch_size = batch_size
+        self.timings = {}
+        self._classifier = classifier
+        self._cache = None
+
+    def config(self):
+        """Constructor arguments, e.g. to rebuild an equivalent engine in a worker process."""
+        return {
+            "model_id": self.model_id,
+            "cache_path": self.cache_path,
+            "cache_max_bytes": self.cache_max_bytes,
+            "batch_size": self.batch_size,
+            "backend": self.backend,
+            "cascade": self.cascade,
+            "cascade_margin": self.cascade_margin,
+            "cascade_max_entropy": self.cascade_max_entropy
+        }
+
+    def cascade_settings(self):
+        """What the cascade gate depends on, or None when every sentence is classified."""
+        if not self.cascade:
+            return None
+        return {"margin": self.cascade_margin, "min_score": CASCADE_MIN_SCORE, "max_entropy": self.cascade_max_entropy}
+
+    def skips_classifier(self, rule_scores):
+        return self.cascade and is_decisive(rule_scores, self.cascade_margin, CASCADE_MIN_SCORE,
+                                            self.cascade_max_entropy)
+
+    @property
+    def classifier_id(self):
+        """Identifies the classifier output: the model id, plus the backend unless it is the reference."""
+        return self.model_id if self.backend == "pipeline" else f"{self.model_id}@{self.backend}"
+
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            started = time.perf_counter()
+            if OFFLINE:
+                os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            self._classifier = load_backend(self.backend, self.model_id)
+            self.timings["classifier_load_s"] = time.perf_counter() - started
+        return self._classifier
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            started = time.perf_counter()
+            self._cache = ScoreCache(self.cache_path, self.cache_max_bytes)
+            self.timings["cache_open_s"] = time.perf_counter() - started
+        return self._cache
+
+    def load(self):
+        """Load tokenizers, classifier and cache now instead of on first use."""
+        load_nltk_tokenizers()
+        self.classifier("Warm up.")
+        self.cache.flush()
+        return self.timings
+
+    def classify_sentence(self, sentence):
+        """Raw classifier output as [label, score] pairs, in the order the pipeline returns them."""
+        results = self.classifier(sentence)[0]
+        return [[result['label'].lower(), result['score']] for result in results]
+
+    def classify_sentences(self, sentences, batch_size=None):
+        """
+        Batched equivalent of classify_sentence for a whole file's sentences.
+        - Every sentence is tokenized once. Sentences are bucketed by exact token length and
+          each bucket's token ids go to the model as they are (classify_encoded), so no batch
+          carries padding and every result matches the per-sentence path.
+        - Classifiers without a tokenizer and classify_encoded (such as the stub in benchmark.py)
+          get the text instead, bucketed by character length.
+        - Buckets are split into chunks of at most batch_size; results come back in input order.
+        """
+        batch_size = batch_size or self.batch_size
+        classifier = self.classifier
+        tokenizer = getattr(classifier, "tokenizer", None)
+        features = None
+        if tokenizer is not None and hasattr(classifier, "classify_encoded"):
+            with metrics.stage("classifier_tokenize"):
+                features = tokenizer(sentences, truncation=True)
+            lengths = [len(ids) for ids in features["input_ids"]]
+        else:
+            lengths = [len(sentence) for sentence in sentences]
+        buckets = {}
+        for index, length in enumerate(lengths):
+            buckets.setdefault(length, []).append(index)
+
+        label_scores = [None] * len(sentences)
+        for length in sorted(buckets):
+            indices = buckets[length]
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                if features is None:
+                    outputs = classifier([sentences[i] for i in chunk], batch_size=len(chunk))
+                else:
+                    outputs = classifier.classify_encoded({name: [values[i] for i in chunk]
+                                                           for name, values in features.items()})
+                for i, results in zip(chunk, outputs):
+                    label_scores[i] = [[result['label'].lower(), result['score']] for result in results]
+        return label_scores
+
+    def rule_scores(self, sentence, tokens=None, unstored=None):
+        """
+        Rule scores of sentence, from the cache if possible. A computed entry is written to the
+        cache, or appended to unstored as (sentence, scores) for store_rule_scores to write later.
+        """
+        namespace = f"rule:{RULE_FINGERPRINT}"
+        scores = self.cache.get(namespace, sentence)
+        if scores is None:
+            scores = rule_based_score(sentence, tokens)
+            if unstored is None:
+                self.cache.put(namespace, sentence, scores)
+            else:
+                unstored.append((sentence, scores))
+        return scores
+
+    def store_rule_scores(self, entries):
+        namespace = f"rule:{RULE_FINGERPRINT}"
+        for sentence, scores in entries:
+            self.cache.put(namespace, sentence, scores)
+
+    def ml_scores(self, sentence):
+        namespace = f"ml:{self.classifier_id}"
+        label_scores = self.cache.get(namespace, sentence)
+        if label_scores is None:
+            with metrics.stage("get_ml_scores"):
+                label_scores = self.classify_sentence(sentence)
+            self.cache.put(namespace, sentence, label_scores)
+        return map_ml_scores(label_scores)
+
+    def label_scores_batch(self, sentences, batch_size=None):
+        """Raw [label, score] lists for every sentence; all cache misses (deduplicated) go through one batched run."""
+        namespace = f"ml:{self.classifier_id}"
+        label_scores = {}
+        for sentence in sentences:
+            if sentence not in label_scores:
+                label_scores[sentence] = self.cache.get(namespace, sentence)
+        missing = [sentence for sentence, cached in label_scores.items() if cached is None]
+        if missing:
+            with metrics.stage("get_ml_scores_batch"):
+                computed_scores = self.classify_sentences(missing, batch_size)
+            for sentence, computed in zip(missing, computed_scores):
+                label_scores[sentence] = computed
+                self.cache.put(namespace, sentence, computed)
+        return [label_scores[sentence] for sentence in sentences]
+
+    def ml_scores_batch(self, sentences, batch_size=None):
+        return [map_ml_scores(label_scores) for label_scores in self.label_scores_batch(sentences, batch_size)]
+
+    def final_score(self, sentence):
+        unstored = []
+        rule_scores = self.rule_scores(sentence, unstored=unstored)
+        if self.skips_classifier(rule_scores):
+            self.cascade_stats["rule_only"] += 1
+            ml_scores = {}
+        else:
+            if self.cascade:
+                self.cascade_stats["classifier"] += 1
+            ml_scores = self.ml_scores(sentence)
+        self.store_rule_scores(unstored)
+        return blend_scores(rule_scores, ml_scores)
+
+    def final_score_matrix(self, sentences, batch_size=None, tokens=None):
+        """
+        Blended scores of sentences as a sentences x EMOTIONS array, classifier misses batched
+        together. tokens, if given, holds each sentence's tokens from sentence_spans.
+        """
+        matrix = get_score_matrix()
+        tokens = tokens or [None] * len(sentences)
+        # New rule entries are only written once the classifier has run: an open write
+        # transaction would lock other engines on the same cache out for the whole batch.
+        unstored = []
+        rule_scores = [self.rule_scores(sentence, words, unstored) for sentence, words in zip(sentences, tokens)]
+        classify = [i for i, scores in enumerate(rule_scores) if not self.skips_classifier(scores)]
+        if self.cascade:
+            self.cascade_stats["classifier"] += len(classify)
+            self.cascade_stats["rule_only"] += len(sentences) - len(classify)
+        label_scores = [None] * len(sentences)
+        for i, pairs in zip(classify, self.label_scores_batch([sentences[i] for i in classify], batch_size)):
+            label_scores[i] = pairs
+        self.store_rule_scores(unstored)
+        self.cache.flush()
+        return matrix.blend(matrix.rule_matrix(rule_scores), matrix.ml_matrix(matrix.label_matrix(label_scores)))
+
+    def final_scores(self, sentences, batch_size=None):
+        """final_score for a list of sentences, with classifier misses batched together."""
+        return get_score_matrix().to_dicts(self.final_score_matrix(sentences, batch_size))
+
+    def close(self):
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+_default_engine = None
+
+def get_engine():
+    """The engine used by the module-level scoring functions, created on first use."""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = EmotionEngine()
+    return _default_engine
+
+def set_engine(engine):
+    global _default_engine
+    _default_engine = engine
+    return engine
+
+def __getattr__(name):
+    # The classifier and cache used to be module globals built at import time.
+    if name == "ml_classifier":
+        return get_engine().classifier
+    if name == "score_cache":
+        return get_engine().cache
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def classify_sentence(sentence):
+    return get_engine().classify_sentence(sentence)
+
+def classify_sentences(sentences, batch_size=ML_BATCH_SIZE):
+    return get_engine().classify_sentences(sentences, batch_size)
+
+def get_ml_scores(sentence):
+    return map_ml_scores(classify_sentence(sentence))
+
+def get_ml_scores_batch(sentences, batch_size=ML_BATCH_SIZE):
+    return [map_ml_scores(label_scores) for label_scores in classify_sentences(sentences, batch_size)]
+
 def final_score(sentence):
-    rb_scores = rule_based_score(sentence)
-    ml_scores = get_ml_scores(sentence)
-    return blend_scores(rb_scores, ml_scores)
+    return get_engine().final_score(sentence)
+
+def final_scores(sentences, batch_size=None):
+    return get_engine().final_scores(sentences, batch_size)
 
 # ---------------------------
 # 6. Normalization & Thresholding Function
@@ -301,118 +701,739 @@ haptic_mapping = {
     }
 }
 
+# Column order of every score matrix.
+EMOTIONS = list(emotion_categories)
+_score_matrix = None
+
+def get_score_matrix():
+    """Compile the emotion, classifier-label and per-dot haptic tables for array scoring on first use."""
+    global _score_matrix
+    if _score_matrix is None:
+        from score_matrix import DotProfile, ScoreMatrix
+        profiles = [DotProfile(**dot_profile(pos)) for pos in DOT_POSITIONS]
+        _score_matrix = ScoreMatrix(EMOTIONS, ml_to_rule_mapping, haptic_mapping, color_map,
+                                    vibration_waveform_map, ALPHA, AMPLIFICATION_FACTOR, profiles)
+    return _score_matrix
+
 # ---------------------------
 # 8. Visualization – Save Emotion Timeline Plots
 # ---------------------------
-def save_emotion_timeline(results, file_name, plot_folder):
-    all_emotions = set()
-    for entry in results:
-        all_emotions.update(entry.get("raw_scores", {}).keys())
-    emotion_series = {emotion: [] for emotion in all_emotions}
-    sentence_numbers = []
-    for entry in results:
-        sentence_numbers.append(entry["sentence_number"])
-        for emotion in all_emotions:
-            emotion_series[emotion].append(entry.get("raw_scores", {}).get(emotion, 0.0))
-    plt.figure(figsize=(12,6))
-    for emotion, series in emotion_series.items():
-        plt.plot(sentence_numbers, series, marker='o', label=emotion)
-    plt.xlabel("Sentence Number")
-    plt.ylabel("Raw Blended Emotion Score")
-    plt.title(f"Emotion Timeline for {file_name}")
-    plt.legend()
-    plt.tight_layout()
-    plot_file = os.path.join(plot_folder, f"{os.path.splitext(file_name)[0]}_emotion_timeline.png")
-    plt.savefig(plot_file)
-    plt.close()
+# "png" renders with matplotlib; "svg" and "html" are drawn directly and need no matplotlib.
+PLOT_FORMAT = "png"
+
+# Plots render in the background while scoring continues; more than one worker renders in processes.
+PLOT_WORKERS = 1
+
+def emotion_timeline_data(results, file_name):
+    """Per-emotion series of process_file_all results, downsampled for plotting (see timeline_plot)."""
+    from timeline_plot import timeline_data
+    with metrics.stage("plot_data"):
+        return timeline_data(results, f"Emotion Timeline for {file_name}")
+
+def save_emotion_timeline(results, file_name, plot_folder, fmt=PLOT_FORMAT):
+    from timeline_plot import render_timeline
+    plot_file = plot_output_path(file_name, plot_folder, fmt)
+    metrics.record("plotting", render_timeline(emotion_timeline_data(results, file_name), plot_file, fmt))
     print(f"Plot saved to {plot_file}")
 
 # ---------------------------
 # 9. Dot-Specific Adjustment Function
 # ---------------------------
+# How each body position changes the base commands: factors for the vibration, thermal and
+# light intensities, and waveforms replaced by gentler ones. Positions not listed keep the base.
+DOT_PROFILES = {
+    "temple": {"vibration": 0.8, "thermal": 0.5, "light": 0.9,
+               "waveforms": {"TRANSITION_HUM3_P100": "TRANSITION_HUM2_P100"}},
+    "wrist": {"vibration": 1.1, "thermal": 1.0, "light": 1.0, "waveforms": {}}
+}
+DOT_POSITION_PROFILES = {
+    "right_temple": "temple",
+    "left_temple": "temple",
+    "right_wrist": "wrist",
+    "left_wrist": "wrist"
+}
+_BASE_DOT_PROFILE = {"vibration": 1.0, "thermal": 1.0, "light": 1.0, "waveforms": {}}
+
+def dot_profile(dot):
+    return DOT_PROFILES.get(DOT_POSITION_PROFILES.get(dot), _BASE_DOT_PROFILE)
+
 def adjust_commands_for_dot(commands, dot):
     """
-    Adjust haptic command parameters based on the dot's location.
-    - For temple dots (right_temple, left_temple): reduce vibration and thermal intensity.
+    Adjust haptic command parameters based on the dot's location (see DOT_PROFILES).
+    - For temple dots (right_temple, left_temple): reduce vibration, thermal and light intensity
+      and soften the HUM3 waveform.
     - For wrist dots (right_wrist, left_wrist): slightly boost vibration intensity.
+    Returns new commands and leaves the input untouched, so every dot gets independent values.
     """
+    profile = dot_profile(dot)
     adjusted = []
     for cmd in commands:
-        new_cmd = cmd.copy()
-        if dot in ["right_temple", "left_temple"]:
-            new_cmd["vibration"]["intensity"] = round(new_cmd["vibration"]["intensity"] * 0.8, 2)
-            new_cmd["thermal"]["intensity"] = round(new_cmd["thermal"]["intensity"] * 0.5, 2)
-            if new_cmd["vibration"]["waveform"] == "TRANSITION_HUM3_P100":
-                new_cmd["vibration"]["waveform"] = "TRANSITION_HUM2_P100"
-            new_cmd["light"]["intensity"] = round(new_cmd["light"]["intensity"] * 0.9, 2)
-        elif dot in ["right_wrist", "left_wrist"]:
-            new_cmd["vibration"]["intensity"] = round(new_cmd["vibration"]["intensity"] * 1.1, 2)
-        adjusted.append(new_cmd)
+        vibration, thermal, light = cmd["vibration"], cmd["thermal"], cmd["light"]
+        adjusted.append({
+            "emotion": cmd["emotion"],
+            "vibration": {
+                "intensity": round(vibration["intensity"] * profile["vibration"], 2),
+                "frequency": vibration["frequency"],
+                "waveform": profile["waveforms"].get(vibration["waveform"], vibration["waveform"])
+            },
+            "thermal": {
+                "temperature": thermal["temperature"],
+                "intensity": round(thermal["intensity"] * profile["thermal"], 2)
+            },
+            "light": {
+                "rgb": list(light["rgb"]),
+                "intensity": round(light["intensity"] * profile["light"], 2)
+            }
+        })
     return adjusted
 
 # ---------------------------
 # 10. Process File Functions
 # ---------------------------
-def process_file_filtered(file_path):
+# Each stage is a generator, so a book flows through one sentence window at a time:
+# text chunks -> sentences -> blended scores -> haptic commands -> per-dot records.
+
+# Characters read per chunk and sentences scored (and batched into the classifier) together.
+STREAM_CHUNK_CHARS = 64 * 1024
+STREAM_WINDOW = 256
+
+# Longest text held back as one unfinished sentence while streaming; longer runs are cut.
+MAX_SENTENCE_CHARS = 10_000
+
+# Define dot positions (using keys from dot_position_mapping)
+DOT_POSITIONS = ["right_wrist", "right_temple", "left_temple", "left_wrist"]
+
+def iter_text_chunks(file_path, chunk_size=STREAM_CHUNK_CHARS):
     with open(file_path, 'r', encoding='utf-8') as f:
-        text = f.read()
-    sentences = sent_tokenize(text)
-    results = []
-    # Define dot positions (using keys from dot_position_mapping)
-    dot_positions = ["right_wrist", "right_temple", "left_temple", "left_wrist"]
-    for idx, sentence in enumerate(sentences, start=1):
-        scores = final_score(sentence)
-        filtered_scores = normalize_and_threshold(scores, threshold=0.05)
-        if filtered_scores:
-            base_commands = generate_haptic_command(filtered_scores, haptic_mapping, weight_threshold=0.1)
-            dot_commands = []
-            for pos in dot_positions:
-                adjusted_cmds = adjust_commands_for_dot(base_commands, pos)
-                dot_commands.append({
-                    "address": dot_position_mapping.get(pos, 0),
-                    "commands": adjusted_cmds
-                })
-            results.append({
-                "sentence_number": idx,
-                "sentence": sentence,
-                "normalized_emotion_scores": filtered_scores,
-                "haptic_commands": dot_commands
-            })
-    return results
-
-def process_file_all(file_path):
+        for chunk in iter(lambda: f.read(chunk_size), ""):
+            yield chunk
+
+# One sentence of the tokenization pass. start/end and token_spans are character offsets into
+# the document; tokens are lowercased, as the lexicons are.
+TokenizedSentence = namedtuple("TokenizedSentence", ["sentence", "start", "end", "tokens", "token_spans"])
+
+def sentence_bounds(text, offset=0):
+    """(sentence, start, end) of every sentence of text, offsets shifted by offset; no word tokens."""
+    bounds = []
+    position = 0
+    for sentence in sent_tokenize(text):
+        start = text.find(sentence, position)
+        if start == -1:
+            start = position
+        end = start + len(sentence)
+        bounds.append((sentence, offset + start, offset + end))
+        position = end
+    return bounds
+
+def tokenize_sentence(sentence, start, end):
+    with metrics.stage("word_tokenize"):
+        tokens, token_spans = tokenize_words(sentence, start)
+    return TokenizedSentence(sentence, start, end, tokens, token_spans)
+
+def sentence_spans(text, offset=0):
+    """
+    The one tokenization pass over a document: its sentences as TokenizedSentence, with
+    [start, end) offsets into text shifted by offset, and the word tokens of each. The GUI
+    highlights and narrates from these offsets, and the rule scorer (lexicon lookups, phrase
+    matching, modifier windows) reads the tokens, so no sentence is tokenized twice.
+    """
+    return [tokenize_sentence(*bound) for bound in sentence_bounds(text, offset)]
+
+class SentenceSplitter:
+    """
+    Incremental sentence splitting for text that arrives in pieces.
+    - feed(chunk) returns the TokenizedSentence spans completed so far; the last sentence of
+      the buffer is held back until more text arrives, so a sentence cut by a chunk boundary is
+      only word-tokenized once it is complete.
+    - Only that unfinished sentence is split again with the next chunk. Once it is longer than
+      max_sentence_chars it is cut at its last space within the limit and returned as a sentence,
+      so text without sentence breaks costs linear time and bounded memory.
+    - close() returns whatever is left.
+    """
+
+    def __init__(self, max_sentence_chars=MAX_SENTENCE_CHARS):
+        self.max_sentence_chars = max_sentence_chars
+        self._buffer = ""
+        self._base = 0
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        bounds = sentence_bounds(self._buffer, self._base)
+        complete = []
+        if len(bounds) >= 2:
+            complete = bounds[:-1]
+            self._advance(bounds[-1][1] - self._base)
+        while len(self._buffer) > self.max_sentence_chars:
+            bound = self._force_cut()
+            if bound is not None:
+                complete.append(bound)
+        return [tokenize_sentence(*bound) for bound in complete]
+
+    def _advance(self, cut):
+        self._buffer = self._buffer[cut:]
+        self._base += cut
+
+    def _force_cut(self):
+        """Cut the buffer's first max_sentence_chars off at the last space; returns its bound, if any text."""
+        piece = self._buffer[:self.max_sentence_chars]
+        end = len(piece.rsplit(None, 1)[0]) if len(piece.split(None, 1)) > 1 else len(piece)
+        sentence = piece[:end].strip()
+        start = self._base + piece.index(sentence) if sentence else None
+        rest = self._buffer[end:]
+        self._advance(end + len(rest) - len(rest.lstrip()))
+        return (sentence, start, start + len(sentence)) if sentence else None
+
+    def close(self):
+        spans = sentence_spans(self._buffer, self._base)
+        self._buffer = ""
+        return spans
+
+def iter_sentences(chunks, sentence_table=None):
+    """
+    Sentence-split a stream of text chunks into TokenizedSentence tuples (see SentenceSplitter).
+    If sentence_table is a list, each (start, end) is appended to it as it is produced.
+    """
+    splitter = SentenceSplitter()
+
+    def spans():
+        for chunk in chunks:
+            yield from splitter.feed(chunk)
+        yield from splitter.close()
+
+    for span in spans():
+        if sentence_table is not None:
+            sentence_table.append((span.start, span.end))
+        yield span
+
+def iter_scored_windows(sentences, engine=None, window=STREAM_WINDOW):
+    """
+    Score TokenizedSentence input window sentences at a time. Yields
+    (first sentence_number, [TokenizedSentence], blended sentences x EMOTIONS matrix).
+    """
+    engine = engine or get_engine()
+
+    def score(spans):
+        return engine.final_score_matrix([span.sentence for span in spans], tokens=[span.tokens for span in spans])
+
+    pending = []
+    first = 1
+    for span in sentences:
+        pending.append(span)
+        if window and len(pending) >= window:
+            yield first, pending, score(pending)
+            first += len(pending)
+            pending = []
+    if pending:
+        yield first, pending, score(pending)
+
+def iter_scored_sentences(sentences, engine=None, window=STREAM_WINDOW):
+    """
+    Yield (sentence_number, sentence, start, end, blended scores) for TokenizedSentence input;
+    window sentences are scored per batch.
+    """
+    matrix = get_score_matrix()
+    for first, spans, blended in iter_scored_windows(sentences, engine, window):
+        for offset, (span, scores) in enumerate(zip(spans, matrix.to_dicts(blended))):
+            yield first + offset, span.sentence, span.start, span.end, scores
+
+def iter_haptic_commands(scored_windows):
+    """
+    Yield (sentence_number, sentence, start, end, filtered scores, per-dot commands) for
+    sentences with emotion; the commands are one list per entry of DOT_POSITIONS. Normalization,
+    thresholding and amplification run on each window's matrix, with the same results as
+    normalize_and_threshold, generate_haptic_command and adjust_commands_for_dot.
+    """
+    matrix = get_score_matrix()
+    for first, spans, blended in scored_windows:
+        with metrics.stage("generate_haptic_command"):
+            rounded, kept = matrix.normalize(blended, threshold=0.05)
+            active, vibration, light = matrix.haptic_intensities(rounded, kept, weight_threshold=0.1)
+            filtered = matrix.filtered_dicts(rounded, kept)
+        with metrics.stage("adjust_commands_for_dot"):
+            commands = matrix.dot_commands(active, vibration, light)
+        for offset, (span, filtered_scores, dot_commands) in enumerate(zip(spans, filtered, commands)):
+            if filtered_scores:
+                yield first + offset, span.sentence, span.start, span.end, filtered_scores, dot_commands
+
+def iter_dot_records(haptic_commands):
+    """Yield output records with each dot position's commands under its address."""
+    addresses = [dot_position_mapping.get(pos, 0) for pos in DOT_POSITIONS]
+    for sentence_number, sentence, start, end, filtered_scores, commands in haptic_commands:
+        dot_commands = [{"address": address, "commands": adjusted_cmds}
+                        for address, adjusted_cmds in zip(addresses, commands)]
+        yield {
+            "sentence_number": sentence_number,
+            "sentence": sentence,
+            "start_char": start,
+            "end_char": end,
+            "normalized_emotion_scores": filtered_scores,
+            "haptic_commands": dot_commands
+        }
+
+def stream_file_filtered(file_path, engine=None, chunk_size=STREAM_CHUNK_CHARS, window=STREAM_WINDOW,
+                         sentence_table=None):
+    """Generator version of process_file_filtered that holds at most one window of sentences."""
+    sentences = iter_sentences(iter_text_chunks(file_path, chunk_size), sentence_table)
+    return iter_dot_records(iter_haptic_commands(iter_scored_windows(sentences, engine, window)))
+
+def score_file(file_path, engine=None):
+    """
+    Tokenize and score a whole file once. Returns its TokenizedSentence spans and the blended
+    sentences x EMOTIONS matrix, from which both the haptic records and the plot are built.
+    """
     with open(file_path, 'r', encoding='utf-8') as f:
         text = f.read()
-    sentences = sent_tokenize(text)
-    results = []
-    for idx, sentence in enumerate(sentences, start=1):
-        scores = final_score(sentence)
-        results.append({
-            "sentence_number": idx,
-            "sentence": sentence,
-            "raw_scores": scores
-        })
-    return results
+    spans = sentence_spans(text)
+    if not spans:
+        return spans, None
+    # Scoring the whole file as one window lets the classifier bucket every sentence at once.
+    engine = engine or get_engine()
+    blended = engine.final_score_matrix([span.sentence for span in spans], tokens=[span.tokens for span in spans])
+    return spans, blended
+
+def scored_records(spans, blended):
+    """Haptic records of a score_file result."""
+    if not spans:
+        return []
+    return list(iter_dot_records(iter_haptic_commands([(1, spans, blended)])))
+
+def scored_results(spans, blended):
+    """process_file_all results of a score_file result."""
+    if not spans:
+        return []
+    return [{
+        "sentence_number": idx,
+        "sentence": span.sentence,
+        "start_char": span.start,
+        "end_char": span.end,
+        "raw_scores": scores
+    } for idx, (span, scores) in enumerate(zip(spans, get_score_matrix().to_dicts(blended)), 1)]
+
+def analyze_file(file_path, engine=None):
+    """Return (sentence table, haptic records): [(start, end)] for every sentence, and the records."""
+    spans, blended = score_file(file_path, engine)
+    return [(span.start, span.end) for span in spans], scored_records(spans, blended)
+
+def process_file_filtered(file_path, engine=None):
+    return analyze_file(file_path, engine)[1]
+
+def process_file_all(file_path, engine=None):
+    return scored_results(*score_file(file_path, engine))
+
+def write_sentence_table(sentence_table, path):
+    """Sidecar for the JSON exports: [start, end) of every sentence, indexed by sentence_number - 1."""
+    with open(path, "w", encoding="utf-8") as f_out:
+        json.dump({"sentence_spans": [list(span) for span in sentence_table]}, f_out, separators=(",", ":"))
+
+def write_jsonl(records, output):
+    """Write each record as one JSON line as soon as it is produced. Returns the record count."""
+    count = 0
+    for record in records:
+        with metrics.stage("json_serialization"):
+            line = json.dumps(record, ensure_ascii=False)
+        output.write(line + "\n")
+        output.flush()
+        count += 1
+    return count
+
+# ---------------------------
+# 11. Build Manifest – Only Rebuild Outputs Whose Inputs Changed
+# ---------------------------
+# Bump when a code change alters the output for unchanged inputs.
+MANIFEST_VERSION = 4
+MANIFEST_PATH = os.path.join(".cache", "build_manifest.json")
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def input_fingerprints(model_id=ML_MODEL_ID, cascade=None):
+    """Fingerprints of everything besides the text that feeds each output type."""
+    mappings = fingerprint(ml_to_rule_mapping, ALPHA)
+    plot = fingerprint(MANIFEST_VERSION, RULE_FINGERPRINT, mappings, model_id)
+    if cascade is not None:
+        plot = fingerprint(plot, cascade)
+    haptics = fingerprint(
+        plot, haptic_mapping, color_map, vibration_waveform_map, dot_position_mapping, AMPLIFICATION_FACTOR,
+        DOT_PROFILES, DOT_POSITION_PROFILES
+    )
+    return {
+        "model_id": model_id,
+        "lexicons": RULE_FINGERPRINT,
+        "mappings": mappings,
+        "plot": plot,
+        "haptics": haptics
+    }
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "files": {}}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def haptic_output_path(file_name, output_folder):
+    return os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}_haptic_output.json")
+
+def jsonl_output_path(file_name, output_folder):
+    return os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}_haptic_output.jsonl")
+
+def sentence_table_path(file_name, output_folder):
+    return os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}_sentences.json")
+
+def track_output_path(file_name, output_folder):
+    return os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}{TRACK_SUFFIX}")
+
+# "track" writes the compact palette format read by gui.py; "json" the original pretty-printed list;
+# "jsonl" one record per line, written while the file is still being scored.
+HAPTIC_FORMATS = ("track",)
+
+def haptic_output_paths(file_name, output_folder, formats=HAPTIC_FORMATS):
+    paths = []
+    if "track" in formats:
+        paths.append(track_output_path(file_name, output_folder))
+    if "json" in formats:
+        paths.append(haptic_output_path(file_name, output_folder))
+    if "jsonl" in formats:
+        paths.append(jsonl_output_path(file_name, output_folder))
+    if "json" in formats or "jsonl" in formats:
+        # Tracks embed the sentence table; the JSON exports get it as a sidecar.
+        paths.append(sentence_table_path(file_name, output_folder))
+    return paths
+
+def plot_output_path(file_name, plot_folder, fmt=PLOT_FORMAT):
+    return os.path.join(plot_folder, f"{os.path.splitext(file_name)[0]}_emotion_timeline.{fmt}")
 
 # ---------------------------
-# 11. Main Processing: Read Files and Save Outputs
+# 12. Main Processing: Read Files and Save Outputs
 # ---------------------------
 input_folder = "texts"     # txibuildfest2025/texts
 output_folder = "haptics"    # txibuildfest2025/haptics
 plot_folder = "plots"      # txibuildfest2025/plots
 
-for folder in [output_folder, plot_folder]:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
+# Worker processes for build_corpus; each one loads the classifier once and handles whole files.
+CORPUS_WORKERS = 1
+
+def _init_worker(engine_config, offline, profile=False):
+    """Process-pool initializer: one warm engine per worker, one torch thread per worker."""
+    global OFFLINE
+    OFFLINE = offline
+    metrics.enable(profile)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    set_engine(EmotionEngine(**engine_config)).load()
 
-for file_name in os.listdir(input_folder):
-    if file_name.endswith(".txt"):
-        full_input_path = os.path.join(input_folder, file_name)
-        results_data = process_file_filtered(full_input_path)
-        output_file = os.path.join(output_folder, f"{os.path.splitext(file_name)[0]}_haptic_output.json")
+def write_haptic_outputs(results_data, file_name, output_folder, formats=HAPTIC_FORMATS, sentence_table=None):
+    if "track" in formats:
+        track_file = track_output_path(file_name, output_folder)
+        with metrics.stage("track_serialization"):
+            data = HapticTrack.from_records(results_data, sentence_table).to_bytes()
+        with open(track_file, "wb") as f_out:
+            f_out.write(data)
+        print(f"Haptic track saved to {track_file}")
+    if "json" in formats:
+        output_file = haptic_output_path(file_name, output_folder)
+        with metrics.stage("json_serialization"):
+            data = json.dumps(results_data, indent=4)
         with open(output_file, "w", encoding="utf-8") as f_out:
-            json.dump(results_data, f_out, indent=4)
+            f_out.write(data)
         print(f"Haptic output saved to {output_file}")
-        
-        all_results = process_file_all(full_input_path)
-        save_emotion_timeline(all_results, file_name, plot_folder)
+    if "jsonl" in formats:
+        jsonl_file = jsonl_output_path(file_name, output_folder)
+        with open(jsonl_file, "w", encoding="utf-8") as f_out:
+            write_jsonl(results_data, f_out)
+        print(f"Haptic records saved to {jsonl_file}")
+    if sentence_table is not None and ("json" in formats or "jsonl" in formats):
+        write_sentence_table(sentence_table, sentence_table_path(file_name, output_folder))
+
+def _build_file(file_name, input_folder, output_folder, plot_folder, build_haptics, build_plot,
+                formats=HAPTIC_FORMATS):
+    """
+    Build the requested outputs for one text. Returns the cache hits and misses it caused, the
+    stage timings it recorded (empty unless profiling), the cascade path counts and the timeline
+    data to plot (None unless build_plot). Plots are rendered by the caller's PlotRenderer.
+    """
+    engine = get_engine()
+    cache = engine.cache
+    hits, misses = cache.hits, cache.misses
+    paths = dict(engine.cascade_stats)
+    full_input_path = os.path.join(input_folder, file_name)
+    plot_data = None
+    if build_haptics and tuple(formats) == ("jsonl",) and not build_plot:
+        # JSONL alone needs no full result list, so stream the book in bounded memory.
+        jsonl_file = jsonl_output_path(file_name, output_folder)
+        sentence_table = []
+        with open(jsonl_file, "w", encoding="utf-8") as f_out:
+            write_jsonl(stream_file_filtered(full_input_path, sentence_table=sentence_table), f_out)
+        write_sentence_table(sentence_table, sentence_table_path(file_name, output_folder))
+        print(f"Haptic records saved to {jsonl_file}")
+    elif build_haptics or build_plot:
+        # Both outputs come from one tokenization and scoring pass over the file.
+        spans, blended = score_file(full_input_path)
+        if build_haptics:
+            sentence_table = [(span.start, span.end) for span in spans]
+            write_haptic_outputs(scored_records(spans, blended), file_name, output_folder, formats, sentence_table)
+        if build_plot:
+            plot_data = emotion_timeline_data(scored_results(spans, blended), file_name)
+    cache.flush()
+    return (cache.hits - hits, cache.misses - misses, metrics.drain(),
+            {path: count - paths[path] for path, count in engine.cascade_stats.items()}, plot_data)
+
+def build_corpus(input_folder, output_folder, plot_folder, force=False, workers=CORPUS_WORKERS,
+                 formats=HAPTIC_FORMATS, plot_format=PLOT_FORMAT, plot_workers=PLOT_WORKERS):
+    """
+    Regenerate the haptic JSON and timeline plot of every text whose inputs changed.
+    - Scoring uses the engine from get_engine(); workers rebuild it from engine.config().
+    - With workers > 1, files are spread over a process pool. Every output depends only on its
+      own text, and the manifest is updated in sorted file order, so results match a serial run.
+    - Plots render on a PlotRenderer (plot_workers) while later files are scored. A plot whose
+      downsampled data is the same as last time is not drawn again.
+    """
+    from timeline_plot import PlotRenderer, data_digest
+    engine = get_engine()
+    for folder in [output_folder, plot_folder]:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+    manifest = load_manifest()
+    fingerprints = input_fingerprints(engine.classifier_id, engine.cascade_settings())
+    manifest.update({key: fingerprints[key] for key in ("model_id", "lexicons", "mappings")})
+    previous = manifest["files"]
+    current = {}
+    jobs = []
+
+    for file_name in sorted(os.listdir(input_folder)):
+        if not file_name.endswith(".txt"):
+            continue
+        text_hash = file_sha256(os.path.join(input_folder, file_name))
+        old = previous.get(file_name, {})
+        entry = {"text": text_hash, "haptics": fingerprints["haptics"], "plot": fingerprints["plot"],
+                 "plot_data": old.get("plot_data")}
+        current[file_name] = entry
+
+        def is_stale(kind, paths):
+            stale = (force or not all(os.path.exists(path) for path in paths)
+                     or old.get("text") != text_hash or old.get(kind) != entry[kind])
+            if not stale:
+                print(f"Up to date: {', '.join(paths)}")
+            return stale
+
+        build_haptics = is_stale("haptics", haptic_output_paths(file_name, output_folder, formats))
+        build_plot = is_stale("plot", [plot_output_path(file_name, plot_folder, plot_format)])
+        if build_haptics or build_plot:
+            jobs.append((file_name, input_folder, output_folder, plot_folder, build_haptics, build_plot,
+                         formats))
+
+    # Up-to-date texts are recorded right away; the rest as their job finishes.
+    pending = {job[0] for job in jobs}
+    done = {name: entry for name, entry in current.items() if name not in pending}
+
+    renderer = PlotRenderer(plot_workers)
+
+    def record(file_name, plot_data):
+        if plot_data is not None:
+            plot_file = plot_output_path(file_name, plot_folder, plot_format)
+            digest = data_digest(plot_data, plot_format)
+            if not force and digest == current[file_name]["plot_data"] and os.path.exists(plot_file):
+                print(f"Plot unchanged: {plot_file}")
+            else:
+                renderer.submit(plot_data, plot_file, plot_format)
+            current[file_name]["plot_data"] = digest
+        done[file_name] = current[file_name]
+        manifest["files"] = {**previous, **done}
+        save_manifest(manifest)
+
+    try:
+        if workers > 1 and len(jobs) > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # "spawn" avoids forking a process that already holds torch threads and an open SQLite handle.
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(engine.config(), OFFLINE, metrics.enabled)) as pool:
+                for job, (hits, misses, samples, paths, plot_data) in zip(jobs, pool.map(_build_file, *zip(*jobs))):
+                    engine.cache.hits += hits
+                    engine.cache.misses += misses
+                    metrics.merge(samples)
+                    for path, count in paths.items():
+                        engine.cascade_stats[path] += count
+                    record(job[0], plot_data)
+        else:
+            for job in jobs:
+                _, _, samples, _, plot_data = _build_file(*job)
+                metrics.merge(samples)
+                record(job[0], plot_data)
+    finally:
+        for seconds in renderer.close():
+            metrics.record("plotting", seconds)
+
+    manifest["files"] = current
+    save_manifest(manifest)
+
+def format_startup_timings(engine):
+    timings = {**STARTUP_TIMINGS, **engine.timings}
+    return "Startup: " + ", ".join(f"{name[:-2]} {seconds:.2f}s" for name, seconds in timings.items())
+
+def corpus_sentences(input_folder, limit=None):
+    """Sentences of the .txt files in input_folder, in file order, up to limit."""
+    sentences = []
+    for file_name in sorted(os.listdir(input_folder)):
+        if file_name.endswith(".txt") and (limit is None or len(sentences) < limit):
+            with open(os.path.join(input_folder, file_name), "r", encoding="utf-8") as f:
+                sentences.extend(sent_tokenize(f.read()))
+    return sentences[:limit]
+
+def backend_parity(engine, input_folder, limit):
+    """parity_report of the engine's backend against the reference pipeline on sentences from input_folder."""
+    sentences = corpus_sentences(input_folder, limit)
+    candidate = engine.classifier  # loaded first, so the offline setting applies to both
+    reference = load_backend("pipeline", engine.model_id)
+    report = parity_report(reference, candidate, sentences, engine.batch_size)
+    return {"backend": engine.backend, "model": engine.model_id, **report}
+
+def cascade_report(engine, sentences):
+    """
+    How many sentences the cascade sends down each path, and how far its normalized scores are
+    from the full blend on the sentences that skip the classifier (which are classified here
+    for the comparison only).
+    """
+    rule_scores = [engine.rule_scores(sentence) for sentence in sentences]
+    skipped = [i for i, scores in enumerate(rule_scores)
+               if is_decisive(scores, engine.cascade_margin, CASCADE_MIN_SCORE, engine.cascade_max_entropy)]
+    full_ml = engine.ml_scores_batch([sentences[i] for i in skipped])
+    engine.cache.flush()
+    differences, same_top, same_emotions = [], 0, 0
+    for i, ml in zip(skipped, full_ml):
+        cascaded = normalize_and_threshold(blend_scores(rule_scores[i], {}), threshold=0.05)
+        full = normalize_and_threshold(blend_scores(rule_scores[i], ml), threshold=0.05)
+        differences.append(max(abs(cascaded.get(e, 0.0) - full.get(e, 0.0)) for e in set(cascaded) | set(full)))
+        same_top += max(cascaded, key=cascaded.get) == max(full, key=full.get)
+        same_emotions += set(cascaded) == set(full)
+    return {
+        "sentences": len(sentences),
+        "rule_only": len(skipped),
+        "classifier": len(sentences) - len(skipped),
+        "settings": {"margin": engine.cascade_margin, "min_score": CASCADE_MIN_SCORE,
+                     "max_entropy": engine.cascade_max_entropy},
+        "drift_on_rule_only": {
+            "mean_abs": round(sum(differences) / len(differences), 4) if differences else 0.0,
+            "max_abs": round(max(differences), 4) if differences else 0.0,
+            "top_emotion_agreement": round(same_top / len(skipped), 4) if skipped else None,
+            "same_emotions": round(same_emotions / len(skipped), 4) if skipped else None
+        }
+    }
+
+def write_profile(path, output):
+    if metrics.enabled and metrics.samples:
+        print(metrics.format_summary(), file=output)
+        print(f"Profile report saved to {metrics.export(path or 'profile_report.json')}", file=output)
+
+def main(argv=None):
+    global OFFLINE
+    parser = argparse.ArgumentParser(
+        description="Score texts for emotion and write DataFeel haptic JSON and emotion timeline plots."
+    )
+    parser.add_argument("--input", default=input_folder, help="Folder of .txt files to analyze.")
+    parser.add_argument("--output", default=output_folder, help="Folder for haptic track and JSON files.")
+    parser.add_argument("--format", choices=["track", "json", "jsonl", "both"], default="track",
+                        help="Haptic output: compact track (default), the original JSON, streamed JSONL, "
+                             "or track and JSON.")
+    parser.add_argument("--stream", metavar="TEXT_FILE",
+                        help="Stream one text's haptic records to stdout as JSONL and exit.")
+    parser.add_argument("--plots", default=plot_folder, help="Folder for *_emotion_timeline plots.")
+    parser.add_argument("--plot-format", choices=["png", "svg", "html"], default=PLOT_FORMAT,
+                        help="Timeline plot format: matplotlib PNG, or a lightweight SVG or HTML page.")
+    parser.add_argument("--plot-workers", type=int, default=PLOT_WORKERS,
+                        help="Processes rendering plots; 1 renders on a background thread.")
+    parser.add_argument("--workers", type=int, default=CORPUS_WORKERS, help="Processes to spread files over.")
+    parser.add_argument("--batch-size", type=int, default=ML_BATCH_SIZE, help="Sentences per classifier batch.")
+    parser.add_argument("--model", default=ML_MODEL_ID, help="Hugging Face model id or local model directory.")
+    parser.add_argument("--backend", choices=BACKEND_NAMES, default=ML_BACKEND,
+                        help="Classifier implementation: full-precision pipeline, int8 dynamic quantization, "
+                             "or an exported ONNX graph (see classifier_backends.py).")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Only run the classifier on sentences whose rule scores are not decisive.")
+    parser.add_argument("--cascade-margin", type=float, default=CASCADE_MARGIN,
+                        help="Relative lead of the top rule emotion over the runner-up that counts as decisive.")
+    parser.add_argument("--cascade-entropy", type=float, default=CASCADE_MAX_ENTROPY,
+                        help="Also require the normalized entropy of the rule scores to be at most this.")
+    parser.add_argument("--cascade-report", action="store_true",
+                        help="Report cascade path counts and drift from the full blend over --input and exit.")
+    parser.add_argument("--parity", type=int, metavar="SENTENCES",
+                        help="Compare --backend with the pipeline on this many sentences from --input and exit.")
+    parser.add_argument("--cache", default=CACHE_PATH, help="Sentence score cache file.")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_BYTES // (1024 * 1024))
+    parser.add_argument("--force", action="store_true", help="Rebuild every output, even if up to date.")
+    parser.add_argument("--offline", action="store_true", help="Never download NLTK data or model files.")
+    parser.add_argument("--check", action="store_true", help="Load all resources, report startup timing and exit.")
+    parser.add_argument("--profile", metavar="REPORT_JSON", nargs="?", const="profile_report.json",
+                        default=metrics.report_path,
+                        help="Time every pipeline stage and write a JSON report (default: profile_report.json).")
+    args = parser.parse_args(argv)
+
+    OFFLINE = OFFLINE or args.offline
+    if args.profile:
+        metrics.enable()
+    engine = set_engine(EmotionEngine(
+        model_id=args.model,
+        cache_path=args.cache,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        batch_size=args.batch_size,
+        backend=args.backend,
+        cascade=args.cascade or args.cascade_report,
+        cascade_margin=args.cascade_margin,
+        cascade_max_entropy=args.cascade_entropy
+    ))
+    try:
+        if args.check:
+            engine.load()
+        elif args.cascade_report:
+            print(json.dumps(cascade_report(engine, corpus_sentences(args.input)), indent=2))
+            return 0
+        elif args.parity:
+            print(json.dumps(backend_parity(engine, args.input, args.parity), indent=2))
+            return 0
+        elif args.stream:
+            write_jsonl(stream_file_filtered(args.stream, engine), sys.stdout)
+            engine.cache.flush()
+            # Keep stdout pure JSONL; timings go to stderr.
+            print(format_startup_timings(engine), file=sys.stderr)
+            write_profile(args.profile, sys.stderr)
+            return 0
+        else:
+            formats = ("track", "json") if args.format == "both" else (args.format,)
+            build_corpus(args.input, args.output, args.plots, force=args.force, workers=args.workers,
+                         formats=formats, plot_format=args.plot_format, plot_workers=args.plot_workers)
+        print(format_startup_timings(engine))
+        print(f"Score cache: {engine.cache.hits} hits, {engine.cache.misses} misses ({engine.cache_path})")
+        if engine.cascade:
+            print(f"Cascade: {engine.cascade_stats['rule_only']} sentences rule-only, "
+                  f"{engine.cascade_stats['classifier']} classified")
+        write_profile(args.profile, sys.stdout)
+    finally:
+        engine.close()
+    return 0
+
+STARTUP_TIMINGS["import_s"] = time.perf_counter() - _IMPORT_STARTED
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,27 @@
 import sys
 import os
-import json
-import pyttsx3
+import time
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QComboBox,
     QSlider, QTextBrowser, QCheckBox
 )
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont, QFontDatabase, QTextCursor
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont, QFontDatabase
 from datafeel.device import discover_devices, Dot
+from narration import NarrationWorker
+from playback_scheduler import PlaybackScheduler
+from haptic_output import DotWriter, SimulatedBus
+from device_pool import DevicePool, MAX_DOTS, parse_sessions
+from paged_text import PagedTextView
+from story_loader import StoryLoader, DEFAULT_STYLESHEET
+from instrumentation import metrics
+
+# Set to a dot count (e.g. 4) to use simulated DataFeel dots instead of hardware.
+SIMULATED_DOTS = int(os.environ.get("DATAFEEL_SIMULATED_DOTS", "0"))
+# Classroom mode: drive many readers' dots at once (see device_pool.py). "auto" groups the
+# discovered dots into readers of four by address; or list each reader's addresses in
+# dot_position_mapping order, e.g. "1,2,3,4;5,6,7,8".
+CLASSROOM_SESSIONS = os.environ.get("DATAFEEL_SESSIONS")
 
 class DataFeelApp(QWidget):
     def __init__(self):
@@ -26,12 +39,26 @@ class DataFeelApp(QWidget):
 
         # Initialize variables
         self.sentences = []
+        self.sentence_spans = []
         self.haptic_data = None
+        self.timeline = []
         self.current_sentence_index = 0
-        self.speed_ms = 500  # Default speed in ms
         self.narration_running = False
+        self.narration_paused = False
+        self.speak_requested_at = 0.0
         self.datafeel_devices = []
-        
+        self.simulated_bus = SimulatedBus(SIMULATED_DOTS) if SIMULATED_DOTS else None
+        self.discover = self.simulated_bus.discover if self.simulated_bus else discover_devices
+        if CLASSROOM_SESSIONS:
+            self.dot_writer = DevicePool(parse_sessions(CLASSROOM_SESSIONS), discover=self.discover)
+        else:
+            self.dot_writer = DotWriter()
+
+        # Stories are parsed off the UI thread and cached, so switching back is instant
+        self.story = None
+        self.requested_story = None
+        self.story_loader = StoryLoader(self.TEXT_DIR, self.HAPTIC_DIR)
+        self.story_loader.story_loaded.connect(self.on_story_loaded)
 
         # Load custom fonts
         self.load_fonts()
@@ -43,9 +70,14 @@ class DataFeelApp(QWidget):
         self.font_size_slider.setValue(12)  # Default font size
         self.font_size_slider.valueChanged.connect(self.update_font_size)
 
-        # Initialize TTS engine
-        self.tts_engine = pyttsx3.init()
-        self.tts_engine.setProperty('rate', 150)
+        # Sentence start times come from a monotonic-clock schedule; highlight, color and haptics fire on it
+        self.scheduler = PlaybackScheduler(words_per_second=2)
+        self.scheduler.sentence_due.connect(self.on_sentence_due)
+        self.scheduler.finished.connect(self.on_narration_complete)
+
+        # Initialize TTS on its own thread; it reports back through signals
+        self.narrator = NarrationWorker(rate=self.scheduler.words_per_second * 60)
+        self.narrator.sentence_started.connect(self.on_sentence_started)
 
         # Story Selection
         self.story_label = QLabel("Choose a Story:")
@@ -72,11 +104,16 @@ class DataFeelApp(QWidget):
 
         # Book Text Display
         self.book_text = QTextBrowser()
+        # Only the page around the narrated sentence is laid out, so full-length books stay responsive
+        self.pager = PagedTextView(self.book_text)
 
         # TTS Controls
         self.play_button = QPushButton("Play Narration")
         self.play_button.clicked.connect(self.start_narration)
 
+        self.pause_button = QPushButton("Pause Narration")
+        self.pause_button.clicked.connect(self.toggle_pause)
+
         self.stop_button = QPushButton("Stop Narration")
         self.stop_button.clicked.connect(self.stop_narration)
 
@@ -93,6 +130,7 @@ class DataFeelApp(QWidget):
         self.layout.addWidget(self.pace_slider)
         self.layout.addWidget(self.book_text)
         self.layout.addWidget(self.play_button)
+        self.layout.addWidget(self.pause_button)
         self.layout.addWidget(self.stop_button)
         self.layout.addWidget(self.connect_button)
         self.layout.addWidget(self.font_size_label)
@@ -142,12 +180,17 @@ class DataFeelApp(QWidget):
         font = self.book_text.font()
         font.setPointSize(font_size)
         self.book_text.setFont(font)
+        self.pager.set_font_size(font_size)
         print(f"Font size updated to {font_size}.")
 
     def connect_to_datafeel(self):
         """Scan and connect to all available DataFeel devices."""
         print("🔍 Scanning for DataFeel Devices...")
-        self.datafeel_devices = discover_devices(4)
+        self.datafeel_devices = self.discover(MAX_DOTS if CLASSROOM_SESSIONS else 4)
+        self.dot_writer.set_devices(self.datafeel_devices)
+        if CLASSROOM_SESSIONS:
+            for session in self.dot_writer.sessions:
+                print(f"👥 {session.name}: dots {session.addresses}")
 
         if self.datafeel_devices:
             print(f"✅ Connected to {len(self.datafeel_devices)} DataFeel devices.")
@@ -162,42 +205,45 @@ class DataFeelApp(QWidget):
         self.stop_narration()
         self.load_story()
 
-    def load_story(self):
-        """Load the selected story text and haptic data."""
-        story_id = self.story_select.currentText().replace(" ", "_").lower()
-
-        text_file = os.path.join(self.TEXT_DIR, f"{story_id}.txt")
-        json_file = os.path.join(self.HAPTIC_DIR, f"{story_id}_haptic_output.json")
+    def story_id_at(self, index):
+        return self.story_select.itemText(index).replace(" ", "_").lower()
 
-        # Load text file
-        if not os.path.exists(text_file):
-            print(f"❌ Error: Story text file not found: {text_file}")
+    def load_story(self):
+        """Show the selected story, from the cache when possible, and prefetch its neighbours."""
+        index = self.story_select.currentIndex()
+        self.requested_story = self.story_id_at(index)
+        story = self.story_loader.request(self.requested_story)
+        if story is not None:
+            self.show_story(story)
         else:
-            try:
-                with open(text_file, "r", encoding="utf-8") as f:
-                    text = f.read()
-                    self.sentences = text.split(". ")
-                    self.book_text.setText(text)
-                print(f"✅ Loaded story text: {text_file}")
-            except Exception as e:
-                print(f"❌ Error reading story file: {e}")
-
-        # Load haptic JSON
-        if not os.path.exists(json_file):
-            print(f"❌ Error: Haptic JSON file not found: {json_file}")
+            self.sentences = []
+            self.sentence_spans = []
+            self.pager.set_text("Loading story...", [])
+        neighbours = [i for i in (index + 1, index - 1) if 0 <= i < self.story_select.count()]
+        self.story_loader.prefetch([self.story_id_at(i) for i in neighbours])
+
+    def on_story_loaded(self, story_id, story):
+        if story_id == self.requested_story and story is not self.story:
+            self.show_story(story)
+
+    def show_story(self, story):
+        self.story = story
+        self.haptic_data = story.haptic_data
+        self.timeline = story.timeline
+        self.sentence_spans = story.sentence_spans
+        self.sentences = story.sentences
+        self.current_sentence_index = 0
+        self.scheduler.set_sentences(story.sentences)
+        if story.text is not None:
+            self.pager.set_text(story.text, story.sentence_spans)
         else:
-            try:
-                with open(json_file, "r") as file:
-                    self.haptic_data = json.load(file)
-                print(f"✅ Loaded haptic JSON: {json_file}")
-            except Exception as e:
-                print(f"❌ Error reading haptic JSON: {e}")
+            self.pager.set_text("", [])
     def update_speed(self):
         """Update narration and reading speed based on slider value."""
         words_per_second = self.pace_slider.value()
-        self.speed_ms = int(1000 / words_per_second)
-        tts_rate = words_per_second * 50
-        self.tts_engine.setProperty('rate', tts_rate)
+        # The schedule and the TTS rate (words per minute) use the same pace
+        self.scheduler.set_pace(words_per_second)
+        self.narrator.set_rate(words_per_second * 60)
         print(f"Speed set to {words_per_second} words per second.")
 
     def start_narration(self):
@@ -207,90 +253,99 @@ class DataFeelApp(QWidget):
             return
 
         self.narration_running = True
+        self.set_paused(False)
         self.current_sentence_index = 0
-        self.speak_sentence()
+        self.scheduler.start(0)
 
     def stop_narration(self):
         """Stop the current narration loop."""
         self.narration_running = False
+        self.set_paused(False)
+        self.scheduler.stop()
+        self.narrator.stop()
         print("🛑 Narration stopped.")
         self.reset_haptics()
 
-    def speak_sentence(self):
-        """Speak the current sentence and send haptic feedback."""
-        if not self.narration_running or self.current_sentence_index >= len(self.sentences):
-            print("✅ Narration complete.")
+    def toggle_pause(self):
+        """Pause or resume narration mid-sentence; the schedule resumes where it left off."""
+        if not self.narration_running:
             return
+        if self.narration_paused:
+            self.set_paused(False)
+            self.scheduler.resume()
+            self.narrator.resume()
+        else:
+            self.set_paused(True)
+            self.scheduler.pause()
+            self.narrator.pause()
 
-        sentence = self.sentences[self.current_sentence_index]
-        print(f"🎙️ Narrating: {sentence}")
-
-        # Highlight the current sentence
-        self.highlight_sentence(sentence)
-
-        # Update Sentifiction Color
-        self.update_sentification_color()
-
-        # Speak the sentence
-        self.tts_engine.say(sentence)
-        self.tts_engine.runAndWait()
+    def set_paused(self, paused):
+        self.narration_paused = paused
+        self.pause_button.setText("Resume Narration" if paused else "Pause Narration")
 
-        # Send haptic feedback
-        if self.haptic_data:
-            self.send_haptic_feedback()
+    def on_sentence_due(self, index):
+        """A sentence's deadline has come: speak it, and fire highlight, color and haptics with it."""
+        if not self.narration_running:
+            return
+        self.current_sentence_index = index
+        sentence = self.sentences[index]
+        print(f"🎙️ Narrating: {sentence}")
+        # Speech that overran its slot is cut off, so the voice never drifts from the highlight
+        self.speak_requested_at = time.perf_counter()
+        self.narrator.speak(index, sentence)
+
+        with metrics.stage("tick.total"):
+            # Highlight the current sentence
+            with metrics.stage("tick.highlight"):
+                self.highlight_sentence(index)
+
+            # Update Sentifiction Color
+            with metrics.stage("tick.color"):
+                self.update_sentification_color()
+
+            # Send haptic feedback
+            if self.haptic_data:
+                with metrics.stage("tick.device_send"):
+                    self.send_haptic_feedback()
+
+    def on_sentence_started(self, index):
+        if self.narration_running and index == self.current_sentence_index:
+            # Time from queuing the sentence to the TTS engine starting to speak it
+            metrics.record("tick.tts_start", time.perf_counter() - self.speak_requested_at)
+
+    def on_narration_complete(self):
+        self.narration_running = False
+        print("✅ Narration complete.")
+        print(f"⏱️ Playback timing: {self.scheduler.stats()}")
 
-        # Move to next sentence after delay
-        self.current_sentence_index += 1
-        QTimer.singleShot(self.speed_ms, self.speak_sentence)
+    def current_playback_entry(self):
+        """Precompiled timeline entry for the current sentence, or None."""
+        if 0 <= self.current_sentence_index < len(self.timeline):
+            return self.timeline[self.current_sentence_index]
+        return None
 
     def update_sentification_color(self):
-        """Update the background color based on sentiment in the haptic JSON."""
-        sentence_data = next(
-            (h for h in self.haptic_data if h["sentence_number"] == self.current_sentence_index + 1),
-            None
-        )
-        if not sentence_data:
+        """Update the background color based on sentiment in the haptic data."""
+        entry = self.current_playback_entry()
+        if not entry:
             print(f"⚠️ No sentence data found for sentence {self.current_sentence_index + 1}.")
-            self.setStyleSheet("background-color: white;")
+            self.setStyleSheet(DEFAULT_STYLESHEET)
             return
 
-        print(f"Debug: Sentence data: {json.dumps(sentence_data, indent=2)}")
-
-        # Loop through haptic commands to extract light data
-        for command_set in sentence_data["haptic_commands"]:
-            for command in command_set.get("commands", []):  # Ensure "commands" exists
-                light_data = command.get("light", {})
-                if light_data:
-                    r, g, b = light_data.get("rgb", [255, 255, 255])  # Default to white
-                    intensity = light_data.get("intensity", 1.0)
-                    r, g, b = int(r * intensity), int(g * intensity), int(b * intensity)  # Scale color by intensity
-                    self.setStyleSheet(f"background-color: rgb({r}, {g}, {b});")
-                    print(f"Updated Sentifiction color to RGB({r}, {g}, {b}) with intensity {intensity}.")
-                    return
-
-        print("⚠️ No light data found for Sentifiction.")
-        self.setStyleSheet("background-color: white;")
-
-
-
+        self.setStyleSheet(entry.stylesheet)
+        if entry.rgb is None:
+            print("⚠️ No light data found for Sentifiction.")
+        else:
+            print(f"Updated Sentifiction color to RGB{entry.rgb}.")
 
     def reset_haptics(self):
         """Reset all connected haptic devices."""
-        for device in self.datafeel_devices:
-            device.registers.set_vibration_mode(0)  # Reset vibration
-            device.set_led(0, 0, 0, 0)  # Turn off LEDs
+        self.dot_writer.reset()  # Stop vibration and turn off LEDs
         print("Haptics reset to normal.")
 
-    def highlight_sentence(self, sentence):
-        """Highlight the sentence currently being narrated."""
-        cursor = self.book_text.textCursor()
-        text = self.book_text.toPlainText()
-        start_index = text.find(sentence)
-
-        if start_index != -1:
-            cursor.setPosition(start_index)
-            cursor.movePosition(QTextCursor.MoveOperation.Right, QTextCursor.MoveMode.KeepAnchor, len(sentence))
-            self.book_text.setTextCursor(cursor)
+    def highlight_sentence(self, index):
+        """Highlight the sentence currently being narrated, by its offsets in the text."""
+        self.pager.highlight(index)
 
     def send_haptic_feedback(self):
         """Send haptic commands to all connected DataFeel Dots."""
@@ -298,39 +353,34 @@ class DataFeelApp(QWidget):
             print("❌ No DataFeel devices connected.")
             return
 
-        sentence_data = next(
-            (h for h in self.haptic_data if h["sentence_number"] == self.current_sentence_index + 1),
-            None
-        )
-
-        if not sentence_data:
+        entry = self.current_playback_entry()
+        if not entry:
             print("⚠️ No haptic data for this sentence.")
             return
 
-        for command_set in sentence_data["haptic_commands"]:
-            address = command_set["address"]
-
-            # Find the correct DataFeel device
-            device = next((d for d in self.datafeel_devices if d.id == address), None)
-            if not device:
-                print(f"⚠️ No device found for address {address}, skipping...")
-                continue
-
-            print(f"🎯 Sending haptic commands to Dot {address}...")
-            for command in command_set["commands"]:
-                if "vibration" in command:
-                    vib = command["vibration"]
-                    device.registers.set_vibration_mode(1)
-                    device.registers.set_vibration_intensity(vib["intensity"])
-                    device.registers.set_vibration_frequency(vib["frequency"])
-                if "thermal" in command:
-                    therm = command["thermal"]
-                    device.activate_thermal_intensity_control(therm["intensity"])
-                if "light" in command:
-                    light = command["light"]
-                    r, g, b = light["rgb"]
-                    brightness = int(light["intensity"] * 255)
-                    device.set_led(r, g, b, brightness)
+        if CLASSROOM_SESSIONS:
+            # Every reader session gets the frame; dropped dots are reconnected in the background.
+            sessions = self.dot_writer.send(entry.targets)
+            print(f"🎯 Sent frame to {sessions} readers ({len(self.dot_writer.devices)} Dots online).")
+            return
+
+        for address in entry.targets.keys() - self.dot_writer.devices.keys():
+            print(f"⚠️ No device found for address {address}, skipping...")
+
+        # Only registers that changed are written, on per-device threads.
+        writes = self.dot_writer.send(entry.targets)
+        print(f"🎯 Sent {writes} register writes to {len(self.dot_writer.devices)} Dots.")
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        if metrics.enabled:
+            self.dot_writer.wait()
+            print(metrics.format_summary())
+            print(f"Reader metrics saved to {metrics.export(metrics.report_path or 'reader_metrics.json')}")
+        self.narrator.shutdown()
+        self.story_loader.shutdown()
+        self.dot_writer.close()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,226 @@
+# haptic_output.py
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import metrics
+
+# Final register values for one dot. None means "not set by this frame" and is never written.
+DotState = namedtuple(
+    "DotState",
+    ["vibration_mode", "vibration_intensity", "vibration_frequency", "thermal_intensity", "led"],
+    defaults=[None] * 5
+)
+
+RESET_STATE = DotState(vibration_mode=0, led=(0, 0, 0, 0))
+
+
+def collapse_commands(commands):
+    """
+    Reduce one dot's command list to the register values it would leave behind.
+    Writing the commands one after another overwrites earlier values, so only the last
+    vibration, thermal and light settings matter.
+    """
+    state = {}
+    for command in commands:
+        if "vibration" in command:
+            vib = command["vibration"]
+            state["vibration_mode"] = 1
+            state["vibration_intensity"] = vib["intensity"]
+            state["vibration_frequency"] = vib["frequency"]
+        if "thermal" in command:
+            state["thermal_intensity"] = command["thermal"]["intensity"]
+        light = command.get("light")
+        if light:
+            r, g, b = light.get("rgb", [255, 255, 255])
+            state["led"] = (r, g, b, int(light.get("intensity", 1.0) * 255))
+    return DotState(**state)
+
+
+def _write_register(device, field, value):
+    if field == "vibration_mode":
+        device.registers.set_vibration_mode(value)
+    elif field == "vibration_intensity":
+        device.registers.set_vibration_intensity(value)
+    elif field == "vibration_frequency":
+        device.registers.set_vibration_frequency(value)
+    elif field == "thermal_intensity":
+        device.activate_thermal_intensity_control(value)
+    elif field == "led":
+        device.set_led(*value)
+
+
+def write_changes(device, changes):
+    """Write [(field, value)] to device, in order. Returns the seconds it took."""
+    started = time.perf_counter()
+    for field, value in changes:
+        _write_register(device, field, value)
+    return time.perf_counter() - started
+
+
+def diff_state(last, target):
+    """Fields of target that are set and differ from last."""
+    return [(field, value) for field, value, old in zip(DotState._fields, target, last)
+            if value is not None and value != old]
+
+
+class DotWriter:
+    """
+    Sends per-dot target states to DataFeel devices, writing only registers that changed.
+    - Each device has its own single-thread queue: writes to different dots run in parallel,
+      writes to the same dot stay in order, and the caller (the UI thread) never waits.
+    - The last state sent to each dot is remembered, so repeated values cost nothing. A write
+      that fails forgets the registers it was changing, so the next frame sends them again.
+    - stats counts frames, register writes, writes skipped because nothing changed and failed
+      frames; latencies holds the seconds each device took to apply each frame.
+    """
+
+    def __init__(self, devices=()):
+        self._lock = threading.Lock()
+        self.devices = {}
+        self._last = {}
+        self._queues = {}
+        self.stats = {"frames": 0, "writes": 0, "skipped": 0, "failures": 0}
+        self.latencies = []
+        self._failing = set()
+        self.set_devices(devices)
+
+    def set_devices(self, devices):
+        self.close()
+        self.devices = {device.id: device for device in devices}
+        self._last = {address: DotState() for address in self.devices}
+        self._failing = set()
+        self._queues = {
+            address: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"dot-{address}")
+            for address in self.devices
+        }
+
+    def diff(self, address, target):
+        """Fields of target that differ from what was last sent to the dot at address."""
+        with self._lock:
+            return diff_state(self._last[address], target)
+
+    def send(self, targets):
+        """Queue a frame {address: DotState}. Returns the number of register writes queued."""
+        queued = 0
+        self.stats["frames"] += 1
+        for address, target in targets.items():
+            if address not in self.devices:
+                continue
+            changes = self.diff(address, target)
+            self.stats["skipped"] += sum(value is not None for value in target) - len(changes)
+            if not changes:
+                continue
+            with self._lock:
+                self._last[address] = self._last[address]._replace(**dict(changes))
+            queued += len(changes)
+            self._queues[address].submit(self._apply, address, changes)
+        self.stats["writes"] += queued
+        return queued
+
+    def reset(self):
+        """Stop vibration and turn off the LEDs on every dot."""
+        return self.send({address: RESET_STATE for address in self.devices})
+
+    def _apply(self, address, changes):
+        try:
+            elapsed = write_changes(self.devices[address], changes)
+        except Exception as e:
+            with self._lock:
+                # The dot may hold any of the old or new values now; None always differs from the next target.
+                self._last[address] = self._last[address]._replace(**{field: None for field, _ in changes})
+                self.stats["failures"] += 1
+                first = address not in self._failing
+                self._failing.add(address)
+            if first:
+                print(f"⚠️ Write to dot {address} failed ({e!r}); its registers are resent with the next frame.",
+                      file=sys.stderr)
+            return
+        with self._lock:
+            self.latencies.append(elapsed)
+            self._failing.discard(address)
+        metrics.record("device_write", elapsed)
+
+    def wait(self):
+        """Block until every queued write has been applied (for tests and benchmarks)."""
+        for queue in self._queues.values():
+            queue.submit(lambda: None).result()
+
+    def close(self):
+        for queue in self._queues.values():
+            queue.shutdown(wait=True)
+        self._queues = {}
+
+
+class SimulatedRegisters:
+    def __init__(self, dot):
+        self._dot = dot
+
+    def set_vibration_mode(self, mode):
+        self._dot.record("vibration_mode", mode)
+
+    def set_vibration_intensity(self, intensity):
+        self._dot.record("vibration_intensity", intensity)
+
+    def set_vibration_frequency(self, frequency):
+        self._dot.record("vibration_frequency", frequency)
+
+
+class SimulatedDot:
+    """
+    Stand-in for datafeel.device.Dot that records register traffic instead of using hardware.
+    - write_latency adds a per-write delay to mimic the serial link.
+    - traffic holds (timestamp, register, value) for every write.
+    - Writes to a dot that is no longer connected raise ConnectionError.
+    """
+
+    def __init__(self, address, write_latency=0.0):
+        self.id = address
+        self.write_latency = write_latency
+        self.connected = True
+        self.registers = SimulatedRegisters(self)
+        self.traffic = []
+
+    def record(self, register, value):
+        if not self.connected:
+            raise ConnectionError(f"Simulated dot {self.id} is disconnected")
+        if self.write_latency:
+            time.sleep(self.write_latency)
+        self.traffic.append((time.perf_counter(), register, value))
+
+    def activate_thermal_intensity_control(self, intensity):
+        self.record("thermal_intensity", intensity)
+
+    def set_led(self, r, g, b, brightness):
+        self.record("led", (r, g, b, brightness))
+
+    def __repr__(self):
+        return f"SimulatedDot(id={self.id})"
+
+
+def discover_simulated_devices(count=4, write_latency=0.0):
+    return [SimulatedDot(address, write_latency) for address in range(1, count + 1)]
+
+
+class SimulatedBus:
+    """
+    Simulated dots that can be unplugged and plugged back in, for load-testing reconnects.
+    discover() works like datafeel.device.discover_devices: it returns the connected dots, and a
+    dot that was plugged back in comes back as a new connection.
+    """
+
+    def __init__(self, count=4, write_latency=0.0):
+        self.dots = {dot.id: dot for dot in discover_simulated_devices(count, write_latency)}
+
+    def discover(self, max_devices=None):
+        dots = [dot for _, dot in sorted(self.dots.items()) if dot.connected]
+        return dots[:max_devices]
+
+    def unplug(self, address):
+        self.dots[address].connected = False
+
+    def plug(self, address):
+        old = self.dots[address]
+        self.dots[address] = SimulatedDot(address, old.write_latency)
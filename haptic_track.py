@@ -0,0 +1,209 @@
+# haptic_track.py
+"""
+Compact storage for per-sentence haptic commands.
+
+The JSON output repeats the full command dict for every dot of every sentence. A track file
+stores each distinct command once in a palette and keeps everything else in flat integer
+columns that reference it:
+
+    magic "HPTK" | u16 version | zlib( u32 header length | JSON header | columns )
+
+The header holds the dot addresses, the emotion names, the command palette, the sentence
+texts and (from version 2) the [start, end) character offsets of every sentence in the source
+text, including sentences without haptics. The columns are little-endian uint32 arrays, in order:
+    sentence_numbers  one per record
+    ref_offsets       records * len(addresses) + 1 offsets into refs
+    refs              palette indices, for each record and dot in address order
+    score_offsets     records + 1 offsets into score_emotions / score_values
+    score_emotions    index into the emotion names
+    score_values      normalized score * 100 (scores are rounded to two decimals)
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+MAGIC = b"HPTK"
+VERSION = 2
+READABLE_VERSIONS = (1, 2)
+TRACK_SUFFIX = "_haptic_track.hpt"
+
+_COLUMNS = ["sentence_numbers", "ref_offsets", "refs", "score_offsets", "score_emotions", "score_values"]
+
+
+def _column_bytes(values):
+    column = array("I", values)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return struct.pack("<I", len(column)) + column.tobytes()
+
+
+def _read_column(payload, offset):
+    (length,) = struct.unpack_from("<I", payload, offset)
+    offset += 4
+    column = array("I")
+    column.frombytes(payload[offset:offset + 4 * length])
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column, offset + 4 * length
+
+
+class HapticTrack:
+    """
+    Read-only view of one story's haptic records.
+    - Commands are shared palette dicts; treat them as immutable.
+    - get(sentence_number) returns a record shaped like one entry of the JSON output.
+    - sentence_spans[sentence_number - 1] is the (start, end) of every sentence in the text,
+      or None for version 1 tracks.
+    """
+
+    def __init__(self, addresses, emotions, palette, sentences, columns, sentence_spans=None):
+        self.addresses = addresses
+        self.emotions = emotions
+        self.palette = palette
+        self.sentences = sentences
+        self.sentence_spans = sentence_spans
+        self.sentence_numbers = columns["sentence_numbers"]
+        self._ref_offsets = columns["ref_offsets"]
+        self._refs = columns["refs"]
+        self._score_offsets = columns["score_offsets"]
+        self._score_emotions = columns["score_emotions"]
+        self._score_values = columns["score_values"]
+        self._index = {number: i for i, number in enumerate(self.sentence_numbers)}
+
+    def __len__(self):
+        return len(self.sentence_numbers)
+
+    @classmethod
+    def from_records(cls, records, sentence_spans=None):
+        """Build a track from records in the JSON output format and the full sentence table."""
+        addresses = []
+        for record in records:
+            for command_set in record["haptic_commands"]:
+                if command_set["address"] not in addresses:
+                    addresses.append(command_set["address"])
+        emotions, emotion_index = [], {}
+        palette, palette_index = [], {}
+        sentences = []
+        columns = {name: [] for name in _COLUMNS}
+        columns["ref_offsets"].append(0)
+        columns["score_offsets"].append(0)
+
+        for record in records:
+            columns["sentence_numbers"].append(record["sentence_number"])
+            sentences.append(record["sentence"])
+            by_address = {cs["address"]: cs["commands"] for cs in record["haptic_commands"]}
+            for address in addresses:
+                for command in by_address.get(address, []):
+                    key = json.dumps(command, sort_keys=True)
+                    if key not in palette_index:
+                        palette_index[key] = len(palette)
+                        palette.append(command)
+                    columns["refs"].append(palette_index[key])
+                columns["ref_offsets"].append(len(columns["refs"]))
+            for emotion, value in record.get("normalized_emotion_scores", {}).items():
+                if emotion not in emotion_index:
+                    emotion_index[emotion] = len(emotions)
+                    emotions.append(emotion)
+                columns["score_emotions"].append(emotion_index[emotion])
+                columns["score_values"].append(int(round(value * 100)))
+            columns["score_offsets"].append(len(columns["score_emotions"]))
+
+        if sentence_spans is not None:
+            sentence_spans = [tuple(span) for span in sentence_spans]
+        return cls(addresses, emotions, palette, sentences,
+                   {name: array("I", values) for name, values in columns.items()}, sentence_spans)
+
+    def to_bytes(self):
+        header = json.dumps({
+            "addresses": self.addresses,
+            "emotions": self.emotions,
+            "palette": self.palette,
+            "sentences": self.sentences,
+            "sentence_spans": self.sentence_spans
+        }, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        columns = [self.sentence_numbers, self._ref_offsets, self._refs,
+                   self._score_offsets, self._score_emotions, self._score_values]
+        payload = struct.pack("<I", len(header)) + header + b"".join(_column_bytes(c) for c in columns)
+        return MAGIC + struct.pack("<H", VERSION) + zlib.compress(payload, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Not a haptic track file")
+        (version,) = struct.unpack_from("<H", data, 4)
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported haptic track version {version}")
+        payload = zlib.decompress(data[6:])
+        (header_length,) = struct.unpack_from("<I", payload, 0)
+        header = json.loads(payload[4:4 + header_length].decode("utf-8"))
+        offset = 4 + header_length
+        columns = {}
+        for name in _COLUMNS:
+            columns[name], offset = _read_column(payload, offset)
+        spans = header.get("sentence_spans")
+        if spans is not None:
+            spans = [tuple(span) for span in spans]
+        return cls(header["addresses"], header["emotions"], header["palette"], header["sentences"], columns, spans)
+
+    def index_of(self, sentence_number):
+        """Position of a sentence number in the track, or None if it has no haptics."""
+        return self._index.get(sentence_number)
+
+    def commands(self, index, address):
+        """Palette commands for one record and dot address."""
+        slot = index * len(self.addresses) + self.addresses.index(address)
+        return [self.palette[ref] for ref in self._refs[self._ref_offsets[slot]:self._ref_offsets[slot + 1]]]
+
+    def scores(self, index):
+        start, end = self._score_offsets[index], self._score_offsets[index + 1]
+        return {self.emotions[e]: v / 100 for e, v in zip(self._score_emotions[start:end], self._score_values[start:end])}
+
+    def record(self, index):
+        record = {
+            "sentence_number": self.sentence_numbers[index],
+            "sentence": self.sentences[index]
+        }
+        if self.sentence_spans is not None:
+            record["start_char"], record["end_char"] = self.sentence_spans[self.sentence_numbers[index] - 1]
+        record["normalized_emotion_scores"] = self.scores(index)
+        record["haptic_commands"] = [
+            {"address": address, "commands": self.commands(index, address)}
+            for address in self.addresses
+        ]
+        return record
+
+    def get(self, sentence_number):
+        index = self.index_of(sentence_number)
+        return None if index is None else self.record(index)
+
+    def records(self):
+        return [self.record(i) for i in range(len(self))]
+
+
+def write_track(records, path, sentence_spans=None):
+    with open(path, "wb") as f:
+        f.write(HapticTrack.from_records(records, sentence_spans).to_bytes())
+
+
+def read_track(path):
+    """Load a .hpt track, or a JSON haptic output file into the same reader API."""
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            return HapticTrack.from_records(json.load(f))
+    with open(path, "rb") as f:
+        return HapticTrack.from_bytes(f.read())
+
+
+if __name__ == "__main__":
+    # Convert existing JSON outputs: python haptic_track.py haptics/*_haptic_output.json
+    import os
+    for json_path in sys.argv[1:]:
+        track = read_track(json_path)
+        track_path = json_path.replace("_haptic_output.json", TRACK_SUFFIX)
+        if track_path == json_path:
+            track_path = os.path.splitext(json_path)[0] + ".hpt"
+        with open(track_path, "wb") as f:
+            f.write(track.to_bytes())
+        print(f"{json_path} ({os.path.getsize(json_path)} bytes) -> {track_path} ({os.path.getsize(track_path)} bytes)")
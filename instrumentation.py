@@ -0,0 +1,137 @@
+# instrumentation.py
+"""
+Stage timings for the analyzer and the reader.
+
+    from instrumentation import metrics
+    with metrics.stage("rule_based_score"):
+        ...
+    metrics.record("tick.highlight", seconds)
+
+Collection is off unless BUILDFEST_PROFILE is set (or metrics.enable() is called). While off,
+stage() hands back one shared no-op context manager and record() returns after a flag check,
+so instrumented code runs at practically full speed.
+
+metrics.report() returns per-stage counts, totals, percentiles and a latency histogram;
+metrics.export(path) writes the same report as JSON.
+"""
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Upper bucket edges of the latency histogram, in milliseconds (the last bucket is open).
+HISTOGRAM_EDGES_MS = [0.01, 0.03, 0.1, 0.3, 1, 3, 10, 30, 100, 300, 1000, 3000]
+
+# "1" enables collection; any other value is also taken as the path to export the report to.
+PROFILE_ENV = "BUILDFEST_PROFILE"
+
+_DISABLED = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("_samples", "_started")
+
+    def __init__(self, samples):
+        self._samples = samples
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._samples.append(time.perf_counter() - self._started)
+        return False
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Metrics:
+    """
+    Named lists of durations in seconds.
+    - Appends are atomic, so stages may be recorded from worker threads.
+    - drain() and merge() move samples between processes (see build_corpus).
+    """
+
+    def __init__(self, enabled=False, report_path=None):
+        self.enabled = enabled
+        self.report_path = report_path
+        self.samples = {}
+
+    @classmethod
+    def from_env(cls):
+        value = os.environ.get(PROFILE_ENV, "")
+        return cls(enabled=bool(value) and value != "0", report_path=value if value not in ("", "0", "1") else None)
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def stage(self, name):
+        """Context manager timing its block under name."""
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self.samples.setdefault(name, []))
+
+    def record(self, name, seconds):
+        if self.enabled:
+            self.samples.setdefault(name, []).append(seconds)
+
+    def reset(self):
+        self.samples = {}
+
+    def drain(self):
+        """Return the collected samples and start over."""
+        samples, self.samples = self.samples, {}
+        return samples
+
+    def merge(self, samples):
+        for name, values in samples.items():
+            self.samples.setdefault(name, []).extend(values)
+
+    def histogram(self, name, edges_ms=HISTOGRAM_EDGES_MS):
+        """Sample counts per bucket; bucket i holds durations up to edges_ms[i], the last one the rest."""
+        counts = [0] * (len(edges_ms) + 1)
+        for seconds in self.samples.get(name, []):
+            counts[bisect_left(edges_ms, seconds * 1000)] += 1
+        return counts
+
+    def summary(self):
+        result = {}
+        for name, values in sorted(self.samples.items()):
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[name] = {
+                "count": len(ordered),
+                "total_s": round(sum(ordered), 6),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 4),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 4),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 4),
+                "max_ms": round(ordered[-1] * 1000, 4)
+            }
+        return result
+
+    def report(self):
+        return {
+            "stages": self.summary(),
+            "histogram_edges_ms": HISTOGRAM_EDGES_MS,
+            "histograms": {name: self.histogram(name) for name in sorted(self.samples) if self.samples[name]}
+        }
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def format_summary(self):
+        lines = [f"{'stage':<28}{'count':>8}{'total s':>10}{'mean ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<28}{stats['count']:>8}{stats['total_s']:>10.3f}{stats['mean_ms']:>10.3f}"
+                         f"{stats['p95_ms']:>10.3f}{stats['max_ms']:>10.3f}")
+        return "\n".join(lines)
+
+
+# Process-wide collector used by final_emotion_analysis and gui.
+metrics = Metrics.from_env()
@@ -0,0 +1,97 @@
+# lexicon_matcher.py
+from collections import deque
+
+
+class LexiconMatcher:
+    """
+    Rule-based emotion scorer compiled once from the lexicons.
+
+    - Single keywords go into a token -> emotions index (one dict lookup per token).
+    - Multi-word expressions, given as token sequences, go into one Aho-Corasick automaton,
+      so all phrases are found in a single left-to-right pass over the sentence tokens.
+    - The intensifier/negator window in front of each match is evaluated in that same pass,
+      so scoring stays linear in sentence length however large the lexicons grow.
+
+    Scores follow score_single_words and score_multi_word_expressions: every keyword
+    occurrence adds its window multiplier, and each phrase counts at most once per sentence,
+    adding mwe_base_score times the multiplier of the tokens in front of its first match.
+    """
+
+    def __init__(self, lexicon, phrases, intensifiers, negators, window_size=3, mwe_base_score=2.0):
+        self.emotions = list(lexicon)
+        self.window_size = window_size
+        self.mwe_base_score = mwe_base_score
+
+        self._factors = {token: 0.5 for token in negators}
+        self._factors.update({token: 2.0 for token in intensifiers})
+
+        self._word_index = {}
+        for emotion, keywords in lexicon.items():
+            for keyword in keywords:
+                emotions = self._word_index.setdefault(keyword, [])
+                if emotion not in emotions:
+                    emotions.append(emotion)
+
+        # Aho-Corasick automaton over tokens: goto transitions, failure links and, per state,
+        # the (phrase id, emotion, length) of every phrase ending there.
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        phrase_id = 0
+        for emotion, sequences in phrases.items():
+            if emotion not in lexicon:
+                continue
+            for tokens in sequences:
+                if not tokens:
+                    continue
+                state = 0
+                for token in tokens:
+                    next_state = self._goto[state].get(token)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._out.append([])
+                        self._goto[state][token] = next_state
+                    state = next_state
+                self._out[state].append((phrase_id, emotion, len(tokens)))
+                phrase_id += 1
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(token, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def score(self, tokens):
+        """Emotion -> score for one lowercased, tokenized sentence."""
+        scores = dict.fromkeys(self.emotions, 0.0)
+        factors = self._factors
+        goto = self._goto
+        fail = self._fail
+        # Modifier multiplier of the window directly in front of each token.
+        window = []
+        matched = set()
+        state = 0
+        for i, token in enumerate(tokens):
+            multiplier = 1.0
+            for j in range(max(0, i - self.window_size), i):
+                multiplier *= factors.get(tokens[j], 1.0)
+            window.append(multiplier)
+
+            for emotion in self._word_index.get(token, ()):
+                scores[emotion] += multiplier
+
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for phrase_id, emotion, length in self._out[state]:
+                if phrase_id not in matched:
+                    matched.add(phrase_id)
+                    scores[emotion] += self.mwe_base_score * window[i - length + 1]
+        return scores
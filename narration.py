@@ -0,0 +1,145 @@
+# narration.py
+import queue
+import threading
+import time
+
+import pyttsx3
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class NarrationWorker(QObject):
+    """
+    Runs pyttsx3 on its own thread so speech never blocks the Qt event loop.
+    - The GUI talks to it only through a command queue (speak, stop, pause, resume, rate);
+      commands are picked up between engine iterations, i.e. within a few milliseconds.
+    - Progress is reported with Qt signals, which are delivered on the GUI thread.
+    - Pause and rate changes restart the current sentence from the last spoken word, so
+      a new speed applies immediately instead of from the next sentence.
+    """
+
+    sentence_started = pyqtSignal(int)         # sentence index
+    word_started = pyqtSignal(int, int, int)   # sentence index, character offset, length
+    sentence_finished = pyqtSignal(int, bool)  # sentence index, completed (False when stopped)
+
+    POLL_SECONDS = 0.005
+
+    def __init__(self, rate=150):
+        super().__init__()
+        self._commands = queue.Queue()
+        self._rate = rate
+        self._engine = None
+        # Every utterance gets a new generation; callbacks from older ones are ignored.
+        self._generation = 0
+        self._current = None  # {"index", "text", "base", "word_offset", "announce"}
+        self._paused = False
+        self._thread = threading.Thread(target=self._run, name="narration", daemon=True)
+        self._thread.start()
+
+    # ---- GUI thread API ----
+    def speak(self, index, text):
+        self._commands.put(("speak", index, text))
+
+    def stop(self):
+        self._commands.put(("stop",))
+
+    def pause(self):
+        self._commands.put(("pause",))
+
+    def resume(self):
+        self._commands.put(("resume",))
+
+    def set_rate(self, rate):
+        self._commands.put(("rate", rate))
+
+    def shutdown(self):
+        self._commands.put(("quit",))
+        self._thread.join(timeout=1.0)
+
+    # ---- Narration thread ----
+    def _run(self):
+        engine = pyttsx3.init()
+        engine.setProperty("rate", self._rate)
+        engine.connect("started-utterance", self._on_utterance_started)
+        engine.connect("started-word", self._on_word_started)
+        engine.connect("finished-utterance", self._on_utterance_finished)
+        self._engine = engine
+        engine.startLoop(False)
+        try:
+            while True:
+                while True:
+                    try:
+                        command = self._commands.get_nowait()
+                    except queue.Empty:
+                        break
+                    if command[0] == "quit":
+                        self._interrupt()
+                        return
+                    self._handle(command)
+                engine.iterate()
+                time.sleep(self.POLL_SECONDS)
+        finally:
+            engine.endLoop()
+
+    def _handle(self, command):
+        name = command[0]
+        if name == "speak":
+            self._interrupt()
+            _, index, text = command
+            self._current = {"index": index, "text": text, "base": 0, "word_offset": 0, "announce": True}
+            self._paused = False
+            self._say_from(0)
+        elif name == "stop":
+            current = self._interrupt()
+            if current is not None:
+                self.sentence_finished.emit(current["index"], False)
+        elif name == "pause":
+            if self._current is not None and not self._paused:
+                self._paused = True
+                self._cancel_utterance()
+        elif name == "resume":
+            if self._current is not None and self._paused:
+                self._paused = False
+                self._say_from(self._current["word_offset"])
+        elif name == "rate":
+            self._rate = command[1]
+            self._engine.setProperty("rate", self._rate)
+            if self._current is not None and not self._paused:
+                self._cancel_utterance()
+                self._say_from(self._current["word_offset"])
+
+    def _say_from(self, offset):
+        self._generation += 1
+        self._current["base"] = offset
+        self._engine.say(self._current["text"][offset:], str(self._generation))
+
+    def _cancel_utterance(self):
+        self._generation += 1
+        self._engine.stop()
+
+    def _interrupt(self):
+        """Silence and forget the current sentence; returns it (or None)."""
+        current, self._current = self._current, None
+        self._paused = False
+        if current is not None:
+            self._cancel_utterance()
+        return current
+
+    def _is_current(self, name):
+        return self._current is not None and name == str(self._generation)
+
+    def _on_utterance_started(self, name):
+        if self._is_current(name) and self._current["announce"]:
+            self._current["announce"] = False
+            self.sentence_started.emit(self._current["index"])
+
+    def _on_word_started(self, name, location, length):
+        if self._is_current(name):
+            offset = self._current["base"] + location
+            self._current["word_offset"] = offset
+            self.word_started.emit(self._current["index"], offset, length)
+
+    def _on_utterance_finished(self, name, completed):
+        if self._is_current(name) and completed:
+            index = self._current["index"]
+            self._current = None
+            self.sentence_finished.emit(index, True)
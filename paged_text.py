@@ -0,0 +1,112 @@
+# paged_text.py
+from bisect import bisect_right
+
+from PyQt6.QtGui import QTextCursor
+
+# Characters of text laid out per page at 12 pt, and extra context kept on each side.
+PAGE_CHARS = 6000
+PREFETCH_CHARS = 1500
+BASE_FONT_SIZE = 12
+
+
+def qt_position_map(text):
+    """
+    Qt counts positions in UTF-16 code units, Python in code points. Returns None when they
+    agree, otherwise a list mapping each Python offset to its Qt position.
+    """
+    if all(ord(ch) < 0x10000 for ch in text):
+        return None
+    positions = [0]
+    for ch in text:
+        positions.append(positions[-1] + (2 if ord(ch) >= 0x10000 else 1))
+    return positions
+
+
+class PagedTextView:
+    """
+    Shows a long text in a QTextBrowser one page of whole sentences at a time.
+    - Qt only lays out the current page: page_chars of text plus prefetch_chars of context on
+      each side, so a highlight near the page edge does not immediately force a new page.
+    - Highlighting a sentence outside the comfortable middle of the page swaps pages; the
+      highlight itself is a cursor move within the page.
+    - Scrolling to the very top or bottom of the browser moves to the previous or next page.
+    - The browser keeps its own font, so font switching and sizing work as before.
+    """
+
+    def __init__(self, browser, page_chars=PAGE_CHARS, prefetch_chars=PREFETCH_CHARS):
+        self.browser = browser
+        self.page_chars = page_chars
+        self.prefetch_chars = prefetch_chars
+        self.text = ""
+        self.spans = []
+        self._starts = []
+        self.page_start = 0
+        self.page_end = 0
+        self._qt_positions = None
+        self._rendering = False
+        browser.verticalScrollBar().valueChanged.connect(self._on_scroll)
+
+    def set_text(self, text, spans):
+        """Replace the document. spans are the [start, end) offsets of every sentence."""
+        self.text = text
+        self.spans = list(spans) or [(0, len(text))]
+        self._starts = [start for start, _ in self.spans]
+        self._render_from(0)
+
+    def set_font_size(self, size):
+        """Lay out fewer characters per page at larger sizes, since fewer fit on screen."""
+        self.page_chars = max(1000, PAGE_CHARS * BASE_FONT_SIZE // max(size, 1))
+        self.prefetch_chars = max(250, PREFETCH_CHARS * BASE_FONT_SIZE // max(size, 1))
+        if self.text:
+            self._render_from(self.page_start)
+
+    def sentence_at(self, offset):
+        return max(0, bisect_right(self._starts, offset) - 1)
+
+    def _render_from(self, offset, index=None):
+        """
+        Lay out the page of whole sentences that starts at or before offset. If index is given,
+        the page runs at least to the end of that sentence, however long the ones before it are.
+        """
+        first = self.sentence_at(max(0, offset))
+        last = self.sentence_at(self.spans[first][0] + self.page_chars + 2 * self.prefetch_chars)
+        if index is not None:
+            last = max(last, index)
+        self.page_start = self.spans[first][0] if first else 0
+        self.page_end = self.spans[last][1] if last < len(self.spans) - 1 else len(self.text)
+        page = self.text[self.page_start:self.page_end]
+        self._qt_positions = qt_position_map(page)
+        self._rendering = True
+        try:
+            self.browser.setPlainText(page)
+        finally:
+            self._rendering = False
+
+    def _qt_position(self, offset):
+        position = offset - self.page_start
+        return position if self._qt_positions is None else self._qt_positions[position]
+
+    def highlight(self, index):
+        """Select sentence index, paging so it sits at least prefetch_chars from the page edges."""
+        start, end = self.spans[index]
+        low = self.page_start + (self.prefetch_chars if self.page_start > 0 else 0)
+        high = self.page_end - (self.prefetch_chars if self.page_end < len(self.text) else 0)
+        if start < low or end > high:
+            self._render_from(start - self.prefetch_chars, index)
+        cursor = self.browser.textCursor()
+        cursor.setPosition(self._qt_position(start))
+        cursor.setPosition(self._qt_position(end), QTextCursor.MoveMode.KeepAnchor)
+        self.browser.setTextCursor(cursor)
+
+    def _on_scroll(self, value):
+        if self._rendering or not self.text:
+            return
+        scrollbar = self.browser.verticalScrollBar()
+        if value >= scrollbar.maximum() and self.page_end < len(self.text):
+            self._render_from(self.page_end - 2 * self.prefetch_chars)
+            scrollbar.setValue(scrollbar.minimum() + 1)
+        elif value <= scrollbar.minimum() and self.page_start > 0:
+            old_start = self.page_start
+            self._render_from(self.page_start - self.page_chars - self.prefetch_chars)
+            if self.page_end > old_start:
+                scrollbar.setValue(scrollbar.maximum() - 1)
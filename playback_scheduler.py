@@ -0,0 +1,138 @@
+# playback_scheduler.py
+import time
+
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+from instrumentation import metrics
+
+# Pause between sentences, and how late a sentence may start before it counts as missed.
+SENTENCE_GAP_S = 0.3
+LATE_TOLERANCE_S = 0.05
+
+
+class PlaybackScheduler(QObject):
+    """
+    Paces a story on a monotonic clock instead of chaining timers after each sentence.
+    - Every sentence has an absolute start deadline: the anchor time plus the words before it
+      divided by the pace (words per second), plus a fixed gap per sentence. A late tick
+      therefore never delays the sentences after it.
+    - If the machine stalls past several deadlines, only the latest due sentence fires, so the
+      highlight and haptics stay locked to where the text should be; the others count as skipped.
+    - Pace changes and pauses move the anchor, keeping the progress through the current sentence.
+    - stats() reports how late each tick fired (jitter) and how many deadlines were missed;
+      with profiling on, every lateness is also recorded as the tick.late metric.
+    """
+
+    sentence_due = pyqtSignal(int)  # sentence index
+    finished = pyqtSignal()
+
+    def __init__(self, words_per_second=2.0, gap_s=SENTENCE_GAP_S, late_tolerance_s=LATE_TOLERANCE_S):
+        super().__init__()
+        self.words_per_second = words_per_second
+        self.gap_s = gap_s
+        self.late_tolerance_s = late_tolerance_s
+        self._word_offsets = [0]
+        self._next = 0
+        self._anchor_index = 0
+        self._anchor_time = 0.0
+        self._paused_at = None
+        self.running = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_timer)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.lateness = []
+        self.missed = 0
+        self.skipped = 0
+
+    def set_sentences(self, sentences):
+        self._word_offsets = [0]
+        for sentence in sentences:
+            self._word_offsets.append(self._word_offsets[-1] + max(1, len(sentence.split())))
+
+    def __len__(self):
+        return len(self._word_offsets) - 1
+
+    def deadline(self, index):
+        """Monotonic time at which sentence index starts (index == len(self) is the end of the story)."""
+        words = self._word_offsets[index] - self._word_offsets[self._anchor_index]
+        return self._anchor_time + words / self.words_per_second + (index - self._anchor_index) * self.gap_s
+
+    def start(self, index=0):
+        self.running = True
+        self._paused_at = None
+        self._next = index
+        self._anchor_index = index
+        self._anchor_time = time.monotonic()
+        self.reset_stats()
+        self._arm()
+
+    def stop(self):
+        self.running = False
+        self._paused_at = None
+        self._timer.stop()
+
+    def pause(self):
+        if self.running and self._paused_at is None:
+            self._paused_at = time.monotonic()
+            self._timer.stop()
+
+    def resume(self):
+        if self.running and self._paused_at is not None:
+            self._anchor_time += time.monotonic() - self._paused_at
+            self._paused_at = None
+            self._arm()
+
+    def set_pace(self, words_per_second):
+        """Change the pace; the time left until the next sentence shrinks or grows accordingly."""
+        if self.running and 0 < self._next <= len(self):
+            now = self._paused_at if self._paused_at is not None else time.monotonic()
+            remaining = max(0.0, self.deadline(self._next) - now)
+            speech_left = max(0.0, remaining - self.gap_s)
+            self._anchor_index = self._next
+            self._anchor_time = now + speech_left * self.words_per_second / words_per_second + min(remaining, self.gap_s)
+        self.words_per_second = words_per_second
+        if self.running and self._paused_at is None:
+            self._arm()
+
+    def _arm(self):
+        delay = self.deadline(self._next) - time.monotonic()
+        self._timer.start(max(0, int(delay * 1000)))
+
+    def _on_timer(self):
+        if not self.running or self._paused_at is not None:
+            return
+        now = time.monotonic()
+        if now < self.deadline(self._next) - 0.001:
+            self._arm()  # Woke up early; wait for the actual deadline
+            return
+        if self._next >= len(self):
+            self.running = False
+            self.finished.emit()
+            return
+        while self._next + 1 < len(self) and self.deadline(self._next + 1) <= now:
+            self._next += 1
+            self.skipped += 1
+        late = now - self.deadline(self._next)
+        self.lateness.append(late)
+        metrics.record("tick.late", late)
+        if late > self.late_tolerance_s:
+            self.missed += 1
+        index = self._next
+        self._next += 1
+        self._arm()
+        self.sentence_due.emit(index)
+
+    def stats(self):
+        ordered = sorted(self.lateness)
+        return {
+            "ticks": len(ordered),
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "mean_late_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+            "p95_late_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2) if ordered else 0.0,
+            "max_late_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0
+        }
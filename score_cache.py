@@ -0,0 +1,114 @@
+# score_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "sentence_scores.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 256 MB
+
+
+def fingerprint(*parts):
+    """Stable SHA-256 hex digest of JSON-serializable parts (sets are sorted first)."""
+    def _default(obj):
+        if isinstance(obj, (set, frozenset)):
+            return sorted(obj)
+        raise TypeError(f"Cannot fingerprint {type(obj).__name__}")
+    payload = json.dumps(parts, sort_keys=True, default=_default, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """
+    On-disk, content-addressed store of per-sentence score components.
+
+    - Entries are keyed by SHA-256 of (namespace, sentence). The namespace carries
+      whatever the value depends on (lexicon fingerprint for rule scores, model id
+      for classifier scores), so changing either simply misses instead of going stale.
+    - Once the stored payload exceeds max_bytes, least recently used entries are
+      evicted until the cache is back under 90% of the limit.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Recency updates are buffered until flush() so lookups never take the write lock.
+        self._touched = {}
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM scores").fetchone()[0]
+
+    @staticmethod
+    def make_key(namespace, sentence):
+        digest = hashlib.sha256()
+        digest.update(namespace.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(sentence.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, namespace, sentence):
+        key = self.make_key(namespace, sentence)
+        row = self._conn.execute("SELECT value FROM scores WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touched[key] = time.time()
+        return json.loads(row[0])
+
+    def put(self, namespace, sentence, scores):
+        key = self.make_key(namespace, sentence)
+        value = json.dumps(scores, separators=(",", ":"))
+        size = len(key) + len(value)
+        old = self._conn.execute("SELECT size FROM scores WHERE key = ?", (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO scores (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time())
+        )
+        self._total_bytes += size - (old[0] if old else 0)
+        if self._total_bytes > self.max_bytes:
+            self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target_bytes):
+        # Entries read since the last flush must count as recently used.
+        self._write_touched()
+        rows = self._conn.execute("SELECT key, size FROM scores ORDER BY last_used ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if self._total_bytes <= target_bytes:
+                break
+            stale.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM scores WHERE key = ?", stale)
+        self._conn.commit()
+
+    def _write_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE scores SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def flush(self):
+        self._write_touched()
+        self._conn.commit()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,178 @@
+# score_matrix.py
+"""
+Emotion scores for many sentences at once, as NumPy arrays.
+
+A batch of sentences is one sentences x emotions matrix whose columns follow the emotion
+order of the lexicon. Classifier output is a sentences x labels matrix that a labels x emotions
+projection (built from ml_to_rule_mapping) turns into emotion scores. Blending, per-row
+max-normalization, thresholding, amplification and the haptic intensities are each a single
+array operation; dicts are only built at the edges (cache lookups in, records out).
+
+Haptic commands come from templates compiled once per dot position and emotion: everything
+that does not depend on the score (waveform, temperature, thermal intensity, color) is fixed
+in an immutable HapticTemplate, so a sentence only scales the vibration and light intensities.
+
+The results are identical to the dict functions in final_emotion_analysis (blend_scores,
+normalize_and_threshold, generate_haptic_command, adjust_commands_for_dot), which remain the
+reference:
+- round2 rounds like Python's round(x, 2), including values that sit on a rounding tie.
+- The projection adds the labels one at a time in ml_to_rule_mapping order, while
+  map_ml_scores adds them in the classifier's output order. The sums still agree because every
+  emotion that takes several labels (Guilt and Regret: anger, then disgust) gets them in the
+  same relative order both ways; keep it that way when changing either.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Score-independent part of one emotion's command on one dot.
+HapticTemplate = namedtuple(
+    "HapticTemplate", ["emotion", "frequency", "waveform", "temperature", "thermal_intensity", "rgb"]
+)
+
+# How a dot position changes the base command: intensity factors and waveform replacements.
+DotProfile = namedtuple("DotProfile", ["vibration", "thermal", "light", "waveforms"])
+
+BASE_PROFILE = DotProfile(vibration=1.0, thermal=1.0, light=1.0, waveforms={})
+
+
+def round2(values):
+    """round(x, 2) for every element, matching Python's correctly rounded result."""
+    scaled = values * 100
+    rounded = np.round(scaled) / 100
+    # np.round works on the scaled float; where that lands next to a .5 tie, defer to Python.
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(float(v), 2) for v in values[ties]]
+    return rounded
+
+
+class ScoreMatrix:
+    """
+    Compiled emotion, label and haptic tables.
+    - emotions: column order of every score matrix.
+    - ml_mapping: {label: {emotion: weight}}, compiled to the projection matrix.
+    - haptic_mapping, color_map, waveform_map: as in final_emotion_analysis.
+    - dot_profiles: one DotProfile per output dot, in address order; templates[d][emotion]
+      holds that dot's HapticTemplate. Without profiles there is one dot with the base commands.
+    """
+
+    def __init__(self, emotions, ml_mapping, haptic_mapping, color_map, waveform_map, alpha,
+                 amplification, dot_profiles=None, max_temperature=40):
+        self.emotions = list(emotions)
+        self.alpha = alpha
+        self.amplification = amplification
+        column = {emotion: i for i, emotion in enumerate(self.emotions)}
+
+        self.labels = list(ml_mapping)
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        self.projection = np.zeros((len(self.labels), len(self.emotions)))
+        for label, weights in ml_mapping.items():
+            for emotion, weight in weights.items():
+                self.projection[self._label_index[label], column[emotion]] = weight
+
+        self.has_haptics = np.array([emotion in haptic_mapping for emotion in self.emotions])
+        self._vibration_base = np.array([haptic_mapping.get(e, {}).get("vibration", {}).get("intensity", 0.0)
+                                         for e in self.emotions])
+        self._light_base = np.array([haptic_mapping.get(e, {}).get("light", {}).get("intensity", 0.0)
+                                     for e in self.emotions])
+        self.dot_profiles = list(dot_profiles or [BASE_PROFILE])
+        self.templates = []
+        for profile in self.dot_profiles:
+            templates = {}
+            for emotion, mapping in haptic_mapping.items():
+                if emotion not in column:
+                    continue
+                raw_temp = mapping["thermal"]["temperature"]
+                waveform = waveform_map.get(mapping["vibration"]["pattern"], "STRONG_BUZZ_P100")
+                thermal_intensity = round((mapping["thermal"]["intensity"] * 2) - 1, 2)
+                templates[emotion] = HapticTemplate(
+                    emotion=emotion,
+                    frequency=mapping["vibration"]["frequency"],
+                    waveform=profile.waveforms.get(waveform, waveform),
+                    temperature=raw_temp if raw_temp <= max_temperature else max_temperature,
+                    thermal_intensity=round(thermal_intensity * profile.thermal, 2),
+                    rgb=tuple(color_map.get(mapping["light"]["color"], (0, 0, 0)))
+                )
+            self.templates.append(templates)
+
+    # ---- Edges: dicts in ----
+    def rule_matrix(self, rule_scores):
+        """Matrix of per-sentence {emotion: score} dicts."""
+        matrix = np.zeros((len(rule_scores), len(self.emotions)))
+        for row, scores in enumerate(rule_scores):
+            matrix[row] = [scores.get(emotion, 0.0) for emotion in self.emotions]
+        return matrix
+
+    def label_matrix(self, label_scores):
+        """Matrix of per-sentence [[label, score], ...] lists; None (not classified) is a zero row."""
+        matrix = np.zeros((len(label_scores), len(self.labels)))
+        for row, pairs in enumerate(label_scores):
+            for label, score in pairs or ():
+                if label in self._label_index:
+                    matrix[row, self._label_index[label]] = score
+        return matrix
+
+    # ---- Array operations ----
+    def ml_matrix(self, labels):
+        scores = np.zeros((labels.shape[0], len(self.emotions)))
+        for i in range(len(self.labels)):
+            scores += labels[:, i:i + 1] * self.projection[i]
+        return scores
+
+    def blend(self, rule, ml):
+        return self.alpha * rule + (1 - self.alpha) * ml
+
+    def normalize(self, blended, threshold=0.05):
+        """Per-row max-normalization: (scores rounded to two decimals, mask of scores >= threshold)."""
+        peak = blended.max(axis=1, keepdims=True) if blended.size else np.zeros((blended.shape[0], 1))
+        normalized = np.divide(blended, peak, out=np.zeros_like(blended), where=peak != 0)
+        return round2(normalized), normalized >= threshold
+
+    def haptic_intensities(self, rounded, kept, weight_threshold=0.1):
+        """(mask of emotions that get a command, vibration intensities, light intensities)."""
+        active = kept & self.has_haptics & (rounded >= weight_threshold)
+        amplified = np.minimum(rounded * self.amplification, 1)
+        return active, round2(self._vibration_base * amplified), round2(self._light_base * amplified)
+
+    # ---- Edges: dicts out ----
+    def to_dicts(self, matrix):
+        return [dict(zip(self.emotions, row)) for row in matrix.tolist()]
+
+    def filtered_dicts(self, rounded, kept):
+        emotions = self.emotions
+        rows = [{} for _ in range(rounded.shape[0])]
+        values = rounded[kept].tolist()
+        for (row, i), value in zip(zip(*(index.tolist() for index in kept.nonzero())), values):
+            rows[row][emotions[i]] = value
+        return rows
+
+    def dot_commands(self, active, vibration, light):
+        """
+        Per row, one command list per dot: the base commands generate_haptic_command would build,
+        adjusted for each dot's profile. Every command is a new dict.
+        """
+        cells = list(zip(*(index.tolist() for index in active.nonzero())))
+        rows = [[[] for _ in self.dot_profiles] for _ in range(active.shape[0])]
+        for dot, (profile, templates) in enumerate(zip(self.dot_profiles, self.templates)):
+            dot_vibration = vibration[active] if profile.vibration == 1.0 else round2(vibration[active] * profile.vibration)
+            dot_light = light[active] if profile.light == 1.0 else round2(light[active] * profile.light)
+            for (row, i), vib, lum in zip(cells, dot_vibration.tolist(), dot_light.tolist()):
+                template = templates[self.emotions[i]]
+                rows[row][dot].append({
+                    "emotion": template.emotion,
+                    "vibration": {
+                        "intensity": vib,
+                        "frequency": template.frequency,
+                        "waveform": template.waveform
+                    },
+                    "thermal": {
+                        "temperature": template.temperature,
+                        "intensity": template.thermal_intensity
+                    },
+                    "light": {
+                        "rgb": list(template.rgb),
+                        "intensity": lum
+                    }
+                })
+        return rows
@@ -0,0 +1,287 @@
+# scoring_service.py
+"""
+Local scoring service: stream haptic records for any text while it is being scored.
+
+    python scoring_service.py --port 8765
+    curl -N --data-binary @texts/giver.txt http://127.0.0.1:8765/score
+
+POST /score takes plain UTF-8 text (Content-Length or chunked upload) and answers with
+application/x-ndjson, one haptic record per line in the same format as
+`final_emotion_analysis.py --stream`; a record is sent as soon as its sentence is scored, and
+sentences are split while the upload is still arriving. If scoring fails part way, the stream
+ends with a {"error": ...} line instead of being cut off. GET /health reports batching stats.
+
+Splitting runs on a worker thread, so a long upload never stalls the other clients. At most
+MAX_PENDING sentences of one request wait to be sent; past that the upload is not read until
+the client has taken more records. Text not yet split into sentences is bounded as well: the
+splitter cuts any run longer than fea.MAX_SENTENCE_CHARS, so a fast uploader cannot queue a
+whole book either way.
+
+One engine is loaded at startup and stays warm. Sentences from all open requests go through a
+MicroBatcher, which hands them to the classifier together: a batch is sent when it holds
+max_batch sentences or max_delay after its first sentence arrived, whichever comes first.
+The engine runs on a single worker thread, which also owns its SQLite score cache.
+"""
+import argparse
+import asyncio
+import codecs
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import final_emotion_analysis as fea
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH = 32
+MAX_DELAY_S = 0.010
+READ_CHUNK = 16 * 1024
+MAX_PENDING = 128
+
+
+class MicroBatcher:
+    """Coalesces concurrent score(sentence) calls into final_score_matrix batches."""
+
+    def __init__(self, engine, max_batch=MAX_BATCH, max_delay=MAX_DELAY_S):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = {"batches": 0, "sentences": 0, "largest_batch": 0, "busy_s": 0.0}
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scoring-engine")
+        self._task = None
+
+    async def start(self):
+        """Load tokenizers, classifier and cache on the engine thread, then start batching."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.engine.load)
+        self._task = asyncio.create_task(self._run())
+
+    async def score(self, sentence, tokens=None):
+        """Blended scores of one sentence (and its tokens from sentence_spans) as a 1 x EMOTIONS matrix."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sentence, tokens, future))
+        return await future
+
+    def run(self, function, *args):
+        """Run function on the engine thread (anything that touches the engine or its cache)."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            started = time.perf_counter()
+            try:
+                sentences, tokens, _ = zip(*batch)
+                blended = await self.run(self.engine.final_score_matrix, list(sentences), None, list(tokens))
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["busy_s"] += time.perf_counter() - started
+            self.stats["batches"] += 1
+            self.stats["sentences"] += len(batch)
+            self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+            for row, (_, _, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(blended[row:row + 1])
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        await self.run(self.engine.close)
+        self._executor.shutdown(wait=True)
+
+
+async def _read_headers(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return request_line, headers
+
+
+async def _iter_body(reader, headers):
+    """Yield the request body as it arrives, for Content-Length and chunked uploads."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()
+    remaining = int(headers.get("content-length", "0"))
+    while remaining > 0:
+        data = await reader.read(min(READ_CHUNK, remaining))
+        if not data:
+            return
+        remaining -= len(data)
+        yield data
+
+
+class ScoringService:
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.requests = 0
+        self.failures = 0
+
+    async def handle(self, reader, writer):
+        try:
+            request_line, headers = await _read_headers(reader)
+            method, path = (request_line.split(" ") + ["", ""])[:2]
+            if method == "GET" and path == "/health":
+                await self._respond(writer, 200, "application/json",
+                                    json.dumps({"requests": self.requests, "failures": self.failures,
+                                                **self.batcher.stats}))
+            elif method == "POST" and path == "/score":
+                self.requests += 1
+                await self._stream_scores(reader, headers, writer)
+            else:
+                await self._respond(writer, 404, "text/plain", "Use POST /score or GET /health\n")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, content_type, body):
+        data = body.encode("utf-8")
+        reason = {200: "OK", 404: "Not Found"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+    async def _stream_scores(self, reader, headers, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+        pending = asyncio.Queue(maxsize=MAX_PENDING)
+        producer = asyncio.create_task(self._split_and_submit(reader, headers, pending))
+        try:
+            sentence_number = 0
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                span, scored = item
+                sentence_number += 1
+                window = [(sentence_number, [span], await scored)]
+                for record in fea.iter_dot_records(fea.iter_haptic_commands(window)):
+                    await self._write_line(writer, record)
+            await producer
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Scoring request failed: {e!r}", file=sys.stderr)
+            await self._write_line(writer, {"error": f"scoring failed: {e}"})
+        finally:
+            producer.cancel()
+            _discard(pending)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _write_line(self, writer, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+        await writer.drain()
+
+    async def _split_and_submit(self, reader, headers, pending):
+        """
+        Split the upload into sentences as it arrives and queue each one for scoring, in order.
+        Ends with None on the queue unless cancelled; the consumer then awaits this task, which
+        re-raises anything that went wrong.
+        """
+        loop = asyncio.get_running_loop()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        splitter = fea.SentenceSplitter()
+
+        async def submit(spans):
+            for span in spans:
+                # Blocks while the queue is full, which stops reading the upload.
+                await pending.put((span, asyncio.ensure_future(self.batcher.score(span.sentence, span.tokens))))
+
+        try:
+            async for data in _iter_body(reader, headers):
+                await submit(await loop.run_in_executor(None, splitter.feed, decoder.decode(data)))
+            text = decoder.decode(b"", final=True)
+            await submit(await loop.run_in_executor(None, lambda: splitter.feed(text) + splitter.close()))
+        except Exception:
+            await pending.put(None)
+            raise
+        await pending.put(None)
+
+
+def _discard(pending):
+    """Drop the sentences left in a finished request's queue, without leaving their scoring running."""
+    while not pending.empty():
+        item = pending.get_nowait()
+        if item is None:
+            continue
+        scored = item[1]
+        if not scored.done():
+            scored.cancel()
+        elif not scored.cancelled():
+            scored.exception()  # Retrieved, so a failed batch is not reported again on shutdown
+
+
+async def serve(engine, host=DEFAULT_HOST, port=DEFAULT_PORT, max_batch=MAX_BATCH, max_delay=MAX_DELAY_S):
+    batcher = MicroBatcher(engine, max_batch, max_delay)
+    await batcher.start()
+    service = ScoringService(batcher)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Scoring service on http://{host}:{port}/score ({fea.format_startup_timings(engine)})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve streaming haptic scoring over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="Most sentences per classifier batch.")
+    parser.add_argument("--max-delay-ms", type=float, default=MAX_DELAY_S * 1000,
+                        help="Longest wait for more sentences before a batch is sent.")
+    parser.add_argument("--model", default=fea.ML_MODEL_ID, help="Hugging Face model id or local model directory.")
+    parser.add_argument("--backend", choices=fea.BACKEND_NAMES, default=fea.ML_BACKEND)
+    parser.add_argument("--cache", default=fea.CACHE_PATH, help="Sentence score cache file.")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Only run the classifier on sentences whose rule scores are not decisive.")
+    parser.add_argument("--offline", action="store_true", help="Never download NLTK data or model files.")
+    args = parser.parse_args(argv)
+
+    fea.OFFLINE = fea.OFFLINE or args.offline
+    engine = fea.set_engine(fea.EmotionEngine(
+        model_id=args.model,
+        cache_path=args.cache,
+        batch_size=args.max_batch,
+        backend=args.backend,
+        cascade=args.cascade
+    ))
+    try:
+        asyncio.run(serve(engine, args.host, args.port, args.max_batch, args.max_delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
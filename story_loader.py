@@ -0,0 +1,193 @@
+# story_loader.py
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from haptic_output import collapse_commands
+from haptic_track import read_track, TRACK_SUFFIX
+
+DEFAULT_STYLESHEET = "background-color: white;"
+
+# Parsed stories kept in memory; the current one plus its neighbours fit comfortably.
+STORY_CACHE_SIZE = 5
+
+class PlaybackEntry:
+    """Everything a narration tick needs for one sentence, precomputed when the story loads."""
+    __slots__ = ("sentence_number", "stylesheet", "rgb", "targets")
+
+    def __init__(self, sentence_number, stylesheet, rgb, targets):
+        self.sentence_number = sentence_number
+        self.stylesheet = stylesheet
+        self.rgb = rgb
+        # {address: DotState} – the register values each dot should end up with
+        self.targets = targets
+
+def compile_playback_timeline(track):
+    """
+    Compile haptic records into a list indexed by sentence_number - 1.
+    - Sentences without haptic data hold None.
+    - The stylesheet uses the first light command of the sentence, scaled by its intensity.
+    - Each dot's commands are collapsed to the register values they leave behind.
+    """
+    if not track:
+        return []
+    timeline = [None] * max(track.sentence_numbers)
+    for index in range(len(track)):
+        record = track.record(index)
+        stylesheet, rgb = DEFAULT_STYLESHEET, None
+        targets = {}
+        for command_set in record["haptic_commands"]:
+            commands = command_set.get("commands", [])
+            targets[command_set["address"]] = collapse_commands(commands)
+            for command in commands:
+                light = command.get("light", {})
+                if light and rgb is None:
+                    r, g, b = light.get("rgb", [255, 255, 255])  # Default to white
+                    intensity = light.get("intensity", 1.0)
+                    rgb = (int(r * intensity), int(g * intensity), int(b * intensity))  # Scale color by intensity
+                    stylesheet = f"background-color: rgb({rgb[0]}, {rgb[1]}, {rgb[2]});"
+        timeline[record["sentence_number"] - 1] = PlaybackEntry(record["sentence_number"], stylesheet, rgb, targets)
+    return timeline
+
+def load_sentence_table(path):
+    """[(start, end)] from an analyzer *_sentences.json sidecar, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [tuple(span) for span in json.load(f)["sentence_spans"]]
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Error reading sentence table: {e}")
+        return None
+
+def split_sentences_with_offsets(text):
+    """Fallback sentence table for stories analyzed before offsets were recorded."""
+    spans = []
+    start = 0
+    for piece in text.split(". "):
+        spans.append((start, start + len(piece)))
+        start += len(piece) + 2
+    return spans
+
+class Story:
+    """A story ready for playback: text, sentence table and compiled haptics."""
+    __slots__ = ("story_id", "text", "sentence_spans", "sentences", "haptic_data", "timeline")
+
+    def __init__(self, story_id, text, sentence_spans, haptic_data, timeline):
+        self.story_id = story_id
+        self.text = text
+        self.sentence_spans = sentence_spans
+        self.sentences = [text[start:end] for start, end in sentence_spans] if text is not None else []
+        self.haptic_data = haptic_data
+        self.timeline = timeline
+
+def parse_story(story_id, text_dir, haptic_dir):
+    """Read and compile one story from disk. Safe to call off the UI thread."""
+    text_file = os.path.join(text_dir, f"{story_id}.txt")
+    track_file = os.path.join(haptic_dir, f"{story_id}{TRACK_SUFFIX}")
+    json_file = os.path.join(haptic_dir, f"{story_id}_haptic_output.json")
+
+    # Load text file
+    text = None
+    if not os.path.exists(text_file):
+        print(f"❌ Error: Story text file not found: {text_file}")
+    else:
+        try:
+            with open(text_file, "r", encoding="utf-8") as f:
+                text = f.read()
+            print(f"✅ Loaded story text: {text_file}")
+        except Exception as e:
+            print(f"❌ Error reading story file: {e}")
+
+    # Load haptic track (compact format), falling back to the JSON export
+    haptic_data = None
+    timeline = []
+    haptic_file = track_file if os.path.exists(track_file) else json_file
+    if not os.path.exists(haptic_file):
+        print(f"❌ Error: Haptic file not found: {track_file} or {json_file}")
+    else:
+        try:
+            haptic_data = read_track(haptic_file)
+            timeline = compile_playback_timeline(haptic_data)
+            print(f"✅ Loaded haptic data: {haptic_file}")
+        except Exception as e:
+            print(f"❌ Error reading haptic data: {e}")
+
+    # Sentence table: the analyzer's offsets, so narration numbering matches the haptic records
+    spans = []
+    if text is not None:
+        spans = haptic_data.sentence_spans if haptic_data is not None else None
+        if spans is None:
+            spans = load_sentence_table(os.path.join(haptic_dir, f"{story_id}_sentences.json"))
+        if spans is None or (spans and spans[-1][1] > len(text)):
+            print("⚠️ No sentence table for this story; splitting on periods instead.")
+            spans = split_sentences_with_offsets(text)
+    return Story(story_id, text, spans, haptic_data, timeline)
+
+class StoryLoader(QObject):
+    """
+    Parses stories on a background thread and keeps the most recent ones in an LRU cache.
+    - request(story_id) returns the cached Story at once, or None and emits story_loaded
+      (on the GUI thread) when parsing finishes.
+    - prefetch(story_ids) warms the cache without waiting; a story is parsed at most once
+      even when it is requested while its prefetch is still running.
+    """
+
+    story_loaded = pyqtSignal(str, object)  # story id, Story
+
+    def __init__(self, text_dir, haptic_dir, capacity=STORY_CACHE_SIZE):
+        super().__init__()
+        self.text_dir = text_dir
+        self.haptic_dir = haptic_dir
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="story-loader")
+
+    def cached(self, story_id):
+        with self._lock:
+            story = self._cache.get(story_id)
+            if story is not None:
+                self._cache.move_to_end(story_id)
+            return story
+
+    def request(self, story_id):
+        story = self.cached(story_id)
+        if story is None:
+            self._submit(story_id)
+        return story
+
+    def prefetch(self, story_ids):
+        for story_id in story_ids:
+            if self.cached(story_id) is None:
+                self._submit(story_id)
+
+    def _submit(self, story_id):
+        with self._lock:
+            if story_id in self._pending:
+                return
+            self._pending[story_id] = self._executor.submit(self._load, story_id)
+
+    def _load(self, story_id):
+        try:
+            story = parse_story(story_id, self.text_dir, self.haptic_dir)
+        except Exception as e:
+            print(f"❌ Error loading story {story_id}: {e}")
+            story = Story(story_id, None, [], None, [])
+        with self._lock:
+            self._pending.pop(story_id, None)
+            # Missing files are not cached, so a story added later is picked up on the next request
+            if story.text is not None:
+                self._cache[story_id] = story
+                self._cache.move_to_end(story_id)
+                while len(self._cache) > self.capacity:
+                    self._cache.popitem(last=False)
+        self.story_loaded.emit(story_id, story)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,50 @@
+import pytest
+
+import final_emotion_analysis as fea
+from benchmark import StubClassifier
+
+TEXT = ("The storm rolled in at dusk. She was terrified and alone. "
+        "By morning the sun was out, and everyone laughed with joy. Nothing else happened.")
+
+
+@pytest.fixture
+def engine(tmp_path):
+    try:
+        fea.load_nltk_tokenizers(offline=True)
+    except LookupError:
+        pytest.skip("NLTK Punkt data is not installed")
+    previous = fea.get_engine()
+    engine = fea.set_engine(fea.EmotionEngine(cache_path=str(tmp_path / "cache" / "scores.sqlite3"),
+                                              classifier=StubClassifier()))
+    yield engine
+    engine.close()
+    fea.set_engine(previous)
+
+
+def test_haptics_and_plot_build_tokenizes_each_document_once(engine, tmp_path, monkeypatch):
+    texts, out, plots = tmp_path / "texts", tmp_path / "haptics", tmp_path / "plots"
+    for folder in (texts, out, plots):
+        folder.mkdir()
+    (texts / "story.txt").write_text(TEXT, encoding="utf-8")
+
+    # Building the lexicon matcher tokenizes its phrases once per process, not per document.
+    fea.get_lexicon_matcher()
+    calls = {"sent_tokenize": 0, "tokenize_words": 0}
+
+    def counting(name, function):
+        def wrapper(*args, **kwargs):
+            calls[name] += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(fea, "sent_tokenize", counting("sent_tokenize", fea.sent_tokenize))
+    monkeypatch.setattr(fea, "tokenize_words", counting("tokenize_words", fea.tokenize_words))
+
+    *_, plot_data = fea._build_file("story.txt", str(texts), str(out), str(plots),
+                                    build_haptics=True, build_plot=True, formats=("track", "json"))
+
+    sentences = plot_data.sentences
+    assert sentences == 4
+    assert calls == {"sent_tokenize": 1, "tokenize_words": sentences}
+    assert (out / "story_haptic_output.json").exists()
+    assert (out / fea.track_output_path("story.txt", "")).exists()
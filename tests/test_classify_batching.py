@@ -0,0 +1,66 @@
+import pytest
+
+import final_emotion_analysis as fea
+from benchmark import StubClassifier
+
+SENTENCES = [
+    "She was terrified.",
+    "Everyone laughed with joy at the party that night.",
+    "He was sad.",
+    "The storm rolled in at dusk and nobody knew what to do.",
+    "She was terrified.",
+    "I am so angry right now!",
+    "Why?",
+    "The room was quiet, and the sunlight felt warm on her face.",
+    "He was glad.",
+]
+
+
+def assert_batched_matches_per_sentence(engine, batch_size):
+    batched = engine.classify_sentences(SENTENCES, batch_size=batch_size)
+    assert batched == [engine.classify_sentence(sentence) for sentence in SENTENCES]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 32])
+def test_stub_classifier_batches_match_per_sentence(tmp_path, batch_size):
+    engine = fea.EmotionEngine(cache_path=str(tmp_path / "scores.sqlite3"), classifier=StubClassifier())
+    assert_batched_matches_per_sentence(engine, batch_size)
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small randomly initialized RoBERTa classifier with a word-level tokenizer, built offline."""
+    pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    tokenizers = pytest.importorskip("tokenizers")
+    import torch
+
+    folder = tmp_path_factory.mktemp("tiny-model")
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    for sentence in SENTENCES:
+        for word in sentence.lower().replace(",", " ").replace(".", " ").replace("!", " ").replace("?", " ").split():
+            vocab.setdefault(word, len(vocab))
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    backend.normalizer = tokenizers.normalizers.Lowercase()
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    backend.post_processor = tokenizers.processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 0), ("</s>", 2)])
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<s>", eos_token="</s>", pad_token="<pad>", unk_token="<unk>")
+    labels = ["anger", "disgust", "fear", "joy", "neutral", "sadness", "surprise"]
+    config = transformers.RobertaConfig(
+        vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        max_position_embeddings=64, pad_token_id=1, num_labels=len(labels),
+        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)})
+    torch.manual_seed(0)
+    transformers.RobertaForSequenceClassification(config).save_pretrained(folder)
+    tokenizer.save_pretrained(folder)
+    return str(folder)
+
+
+@pytest.mark.parametrize("backend", ["pipeline", "quantized"])
+@pytest.mark.parametrize("batch_size", [2, 32])
+def test_model_batches_match_per_sentence(tmp_path, tiny_model, backend, batch_size):
+    engine = fea.EmotionEngine(model_id=tiny_model, backend=backend, cache_path=str(tmp_path / "scores.sqlite3"))
+    assert hasattr(engine.classifier, "classify_encoded")
+    assert_batched_matches_per_sentence(engine, batch_size)
@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+import final_emotion_analysis as fea
+from benchmark import StubClassifier
+
+SENTENCES = ["She was terrified and alone.", "Everyone laughed with joy.", "The storm rolled in at dusk."]
+
+
+class LockCheckingClassifier(StubClassifier):
+    """Tries to take the cache's write lock, as another engine would, while a batch is classified."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.lock_errors = []
+
+    def __call__(self, inputs, batch_size=None, **kwargs):
+        if not isinstance(inputs, str):
+            conn = sqlite3.connect(self.cache_path, timeout=0.2)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.rollback()
+            except sqlite3.OperationalError as e:
+                self.lock_errors.append(str(e))
+            finally:
+                conn.close()
+        return super().__call__(inputs, batch_size, **kwargs)
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_cache_is_not_locked_while_the_classifier_runs(tmp_path, warm):
+    cache_path = str(tmp_path / "scores.sqlite3")
+    classifier = LockCheckingClassifier(cache_path)
+    engine = fea.EmotionEngine(cache_path=cache_path, classifier=classifier)
+    if warm:
+        # Rule scores cached, classifier output not.
+        for sentence in SENTENCES:
+            engine.rule_scores(sentence)
+        engine.cache.flush()
+    tokens = [fea.tokenize_words(sentence)[0] for sentence in SENTENCES]
+    engine.final_score_matrix(SENTENCES, tokens=tokens)
+    assert classifier.lock_errors == []
+
+    # Everything was stored: a second run is served from the cache alone.
+    misses = engine.cache.misses
+    engine.final_score_matrix(SENTENCES, tokens=tokens)
+    assert engine.cache.misses == misses
+    engine.close()
@@ -0,0 +1,41 @@
+import pytest
+
+import final_emotion_analysis as fea
+
+SENTENCES = [
+    "She was terrified.",
+    "She was not afraid, she was very, very terrified and nervous.",
+    "He never really felt so utterly heartbroken.",
+    "Her heart pounding, she felt the ice skittering up her spine.",
+    "It was all her fault, it was her fault, all her fault.",
+    "Her face so small, so pale, and the laughter had vanished.",
+    "Not so peaceful sleep came, and then no peaceful sleep at all.",
+    "The color returned to her cheeks; his arms were firm around her to shield her.",
+    "Danger lurking, she did n't move, never uneasy, never anxious.",
+    "Nothing to see here.",
+    "",
+]
+
+
+@pytest.fixture(scope="module")
+def punkt():
+    try:
+        fea.load_nltk_tokenizers(offline=True)
+    except LookupError:
+        pytest.skip("NLTK Punkt data is not installed")
+
+
+@pytest.mark.parametrize("sentence", SENTENCES)
+def test_matcher_matches_reference(punkt, sentence):
+    assert fea.rule_based_score(sentence) == fea.reference_rule_based_score(sentence)
+
+
+def test_phrase_across_line_break(punkt):
+    # The reference matches phrases as raw substrings and misses one split by a line break;
+    # the matcher works on tokens and finds it. This is the one known difference.
+    sentence = "Slowly the color\nreturned to her face."
+    matched = fea.rule_based_score(sentence)
+    reference = fea.reference_rule_based_score(sentence)
+    assert matched["Relief"] == reference["Relief"] + fea.MWE_BASE_SCORE
+    assert {emotion: score for emotion, score in matched.items() if emotion != "Relief"} == \
+        {emotion: score for emotion, score in reference.items() if emotion != "Relief"}
@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtGui")
+
+from paged_text import PagedTextView
+
+
+class FakeCursor:
+    def __init__(self, browser):
+        self.browser = browser
+        self.anchor = self.position = 0
+
+    def setPosition(self, position, mode=None):
+        length = len(self.browser.document) // 2
+        if position > length:
+            raise ValueError(f"position {position} > doc len {length}")
+        if mode is None:
+            self.anchor = position
+        self.position = position
+
+
+class FakeSignal:
+    def connect(self, slot):
+        pass
+
+
+class FakeScrollBar:
+    valueChanged = FakeSignal()
+
+
+class FakeBrowser:
+    """
+    The parts of QTextBrowser PagedTextView uses. Like Qt, the document counts positions in
+    UTF-16 code units, and cursor positions past its end are rejected.
+    """
+
+    def __init__(self):
+        self.document = b""
+        self.selection = None
+
+    def verticalScrollBar(self):
+        return FakeScrollBar()
+
+    def setPlainText(self, text):
+        self.document = text.encode("utf-16-le")
+
+    def textCursor(self):
+        return FakeCursor(self)
+
+    def setTextCursor(self, cursor):
+        self.selection = self.document[2 * cursor.anchor:2 * cursor.position].decode("utf-16-le")
+
+
+def sentence_table(text, sentences):
+    spans, position = [], 0
+    for sentence in sentences:
+        start = text.index(sentence, position)
+        position = start + len(sentence)
+        spans.append((start, position))
+    return spans
+
+
+@pytest.mark.parametrize("emoji", ["", "\U0001F600 "])
+def test_highlight_after_sentence_longer_than_a_page(emoji):
+    sentences = ["Start here.", emoji + "word " * 5000 + "end.", "Next sentence here.", "And another."]
+    text = " ".join(sentences)
+    browser = FakeBrowser()
+    view = PagedTextView(browser, page_chars=6000, prefetch_chars=1500)
+    view.set_text(text, sentence_table(text, sentences))
+
+    for index in (2, 3, 1, 0):
+        view.highlight(index)
+        assert browser.selection is not None
+        start, end = view.spans[index]
+        assert view.page_start <= start and end <= view.page_end
+    view.highlight(2)
+    assert browser.selection == "Next sentence here."
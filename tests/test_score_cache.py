@@ -0,0 +1,21 @@
+import time
+
+from score_cache import ScoreCache
+
+
+def test_eviction_keeps_entries_read_since_the_last_flush(tmp_path):
+    cache = ScoreCache(str(tmp_path / "scores.sqlite3"), max_bytes=10 ** 9)
+    for i in range(10):
+        cache.put("rule", f"sentence {i}", [i] * 10)
+        time.sleep(0.001)
+    cache.flush()
+    time.sleep(0.01)
+    assert cache.get("rule", "sentence 0") is not None
+
+    # The next put goes over the limit, so the least recently used entries are evicted.
+    cache.max_bytes = cache._total_bytes
+    cache.put("rule", "new sentence", [0] * 10)
+
+    assert cache.get("rule", "sentence 0") is not None
+    assert cache.get("rule", "sentence 1") is None
+    cache.close()
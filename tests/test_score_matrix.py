@@ -0,0 +1,97 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+import final_emotion_analysis as fea
+from benchmark import StubClassifier
+from score_matrix import round2
+
+
+def reference_records(engine, sentences):
+    """Records built the pre-matrix way: blend_scores -> normalize_and_threshold ->
+    generate_haptic_command -> adjust_commands_for_dot, one sentence at a time."""
+    records = []
+    for number, sentence in enumerate(sentences, 1):
+        blended = fea.blend_scores(engine.rule_scores(sentence), fea.map_ml_scores(engine.classify_sentence(sentence)))
+        filtered = fea.normalize_and_threshold(blended, threshold=0.05)
+        if not filtered:
+            continue
+        base = fea.generate_haptic_command(filtered, fea.haptic_mapping, weight_threshold=0.1)
+        records.append({
+            "sentence_number": number,
+            "sentence": sentence,
+            "start_char": 0,
+            "end_char": len(sentence),
+            "normalized_emotion_scores": filtered,
+            "haptic_commands": [{"address": fea.dot_position_mapping[pos],
+                                 "commands": fea.adjust_commands_for_dot(base, pos)}
+                                for pos in fea.DOT_POSITIONS]
+        })
+    return records
+
+
+def matrix_records(engine, sentences):
+    spans = [fea.TokenizedSentence(sentence, 0, len(sentence), *fea.tokenize_words(sentence)) for sentence in sentences]
+    blended = engine.final_score_matrix(sentences, tokens=[span.tokens for span in spans])
+    return list(fea.iter_dot_records(fea.iter_haptic_commands([(1, spans, blended)])))
+
+
+def lexicon_sentences(count, seed=0):
+    """Sentences mixing lexicon keywords, phrases, modifiers and filler words."""
+    rng = random.Random(seed)
+    keywords = [word for words in fea.emotion_categories.values() for word in words]
+    phrases = [phrase for phrases in fea.mwe_expressions.values() for phrase in phrases]
+    modifiers = sorted(fea.intensifiers | fea.negators)
+    filler = ["the", "she", "walked", "home", "and", "light", "was", "there", "again"]
+    sentences = ["Nothing to see here.", "She was terrified."]
+    for _ in range(count):
+        words = []
+        for _ in range(rng.randint(1, 12)):
+            pool = rng.choice([keywords, keywords, phrases, modifiers, filler, filler])
+            words.append(rng.choice(pool))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = fea.EmotionEngine(cache_path=str(tmp_path / "scores.sqlite3"), classifier=StubClassifier())
+    yield engine
+    engine.close()
+
+
+def test_matrix_records_match_dict_path(engine):
+    sentences = lexicon_sentences(400)
+    expected = reference_records(engine, sentences)
+    assert len(expected) > 100
+    assert json.dumps(matrix_records(engine, sentences)) == json.dumps(expected)
+
+
+def test_round2_matches_python_round_on_ties():
+    # np.round(x * 100) / 100 gets 0.005, 0.015, 2.675 and 0.65 * 0.5 wrong.
+    ties = [0.005, 0.015, 0.125, 0.135, 0.145, 0.285, 0.575, 1.005, 2.675, 0.5 * 0.225, 0.65 * 0.5, 0.85 * 0.3]
+    values = np.array(ties + [random.Random(1).random() for _ in range(1000)])
+    assert round2(values).tolist() == [round(value, 2) for value in values.tolist()]
+
+
+def test_haptic_intensities_match_generate_haptic_command_on_ties():
+    matrix = fea.get_score_matrix()
+    # Every two-decimal score for every emotion; base intensity x amplified score lands on
+    # rounding ties for some of them (e.g. 0.5 x 0.3 x 1.5 = 0.225).
+    grid = np.round(np.arange(10, 101) / 100, 2)
+    tie_cells = 0
+    for column, emotion in enumerate(matrix.emotions):
+        rounded = np.zeros((len(grid), len(matrix.emotions)))
+        rounded[:, column] = grid
+        kept = rounded >= 0.05
+        active, vibration, light = matrix.haptic_intensities(rounded, kept, weight_threshold=0.1)
+        scaled = np.concatenate([matrix._vibration_base[column] * np.minimum(grid * matrix.amplification, 1),
+                                 matrix._light_base[column] * np.minimum(grid * matrix.amplification, 1)]) * 100
+        tie_cells += int((np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6).sum())
+        commands = matrix.dot_commands(active, vibration, light)
+        for row, score in enumerate(grid.tolist()):
+            base = fea.generate_haptic_command({emotion: score}, fea.haptic_mapping, weight_threshold=0.1)
+            assert commands[row] == [fea.adjust_commands_for_dot(base, pos) for pos in fea.DOT_POSITIONS]
+    assert tie_cells > 0
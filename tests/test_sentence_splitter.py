@@ -0,0 +1,45 @@
+import pytest
+
+import final_emotion_analysis as fea
+
+STORY = ("The storm rolled in at dusk. She was terrified and alone! Was anyone there? "
+         "By morning the sun was out, and everyone laughed with joy.\n\nNothing else happened. ") * 40
+
+
+@pytest.fixture
+def punkt():
+    try:
+        fea.load_nltk_tokenizers(offline=True)
+    except LookupError:
+        pytest.skip("NLTK Punkt data is not installed")
+
+
+def split(text, chunk_size, splitter):
+    spans = []
+    for start in range(0, len(text), chunk_size):
+        spans.extend(splitter.feed(text[start:start + chunk_size]))
+    return spans + splitter.close()
+
+
+@pytest.mark.parametrize("chunk_size", [7, 100, 4096])
+def test_chunked_split_matches_whole_text(punkt, chunk_size):
+    assert split(STORY, chunk_size, fea.SentenceSplitter()) == fea.sentence_spans(STORY)
+
+
+def test_text_without_sentence_breaks_is_cut_and_scanned_linearly(monkeypatch):
+    text = "word " * 100_000
+    scanned = []
+
+    def counting_sent_tokenize(buffer):
+        scanned.append(len(buffer))
+        return [buffer.strip()] if buffer.strip() else []
+
+    monkeypatch.setattr(fea, "sent_tokenize", counting_sent_tokenize)
+    splitter = fea.SentenceSplitter(max_sentence_chars=1000)
+    spans = split(text, 4096, splitter)
+
+    assert max(scanned) <= 1000 + 4096
+    assert sum(scanned) <= 2 * len(text)
+    assert all(len(span.sentence) <= 1000 for span in spans)
+    assert all(text[span.start:span.end] == span.sentence for span in spans)
+    assert sum(len(span.tokens) for span in spans) == 100_000
@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+
+from haptic_track import TRACK_SUFFIX, HapticTrack
+from story_loader import parse_story
+
+
+def test_track_without_records_keeps_its_sentence_table(tmp_path):
+    # No sentence has emotion, so the track holds no records, only the analyzer's sentence table.
+    text = "Mr. Smith walked in. He sat down. It was Tuesday."
+    spans = [(0, 20), (21, 33), (34, 49)]
+    (tmp_path / "story.txt").write_text(text, encoding="utf-8")
+    track = HapticTrack.from_records([], spans)
+    assert len(track) == 0
+    (tmp_path / f"story{TRACK_SUFFIX}").write_bytes(track.to_bytes())
+
+    story = parse_story("story", str(tmp_path), str(tmp_path))
+
+    assert story.sentence_spans == spans
@@ -0,0 +1,221 @@
+# timeline_plot.py
+"""
+Emotion timeline plots, rendered off the scoring path.
+
+timeline_data() turns per-sentence raw scores into one series per emotion. Series longer than
+max_points are downsampled with Largest-Triangle-Three-Buckets (LTTB), which keeps the peaks and
+turns that give the plot its shape, so a thousand-sentence book draws as fast as a short story
+and stays readable. The result is small and picklable: it is what gets sent to a renderer and
+what is hashed to tell whether a plot would change at all.
+
+Formats:
+    png    matplotlib's object-oriented API on the Agg canvas (no pyplot state, no GUI backend)
+    svg    a standalone SVG drawn directly, without importing matplotlib
+    html   the same SVG in a small HTML page with a legend; hover a line for its emotion
+
+PlotRenderer renders in the background while files are still being scored: on one thread by
+default, or on a pool of processes for large corpora.
+"""
+import html
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from score_cache import fingerprint
+
+PLOT_FORMATS = ("png", "svg", "html")
+
+# Longest series that is drawn point for point; longer ones are downsampled with LTTB.
+MAX_PLOT_POINTS = 600
+
+# Markers are only drawn while they stay distinguishable.
+MARKER_LIMIT = 80
+
+# matplotlib's default color cycle (tab10), so every format uses the same colors.
+PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+           "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+# series: {emotion: (sentence_numbers, scores)}, emotions in sorted order.
+TimelineData = namedtuple("TimelineData", ["title", "sentences", "series"])
+
+
+def lttb(x, y, max_points):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps to draw (x, y) with max_points."""
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # First and last point are kept; the rest is split into max_points - 2 buckets.
+    edges = (np.arange(max_points - 1) * (n - 2) / (max_points - 2)).astype(int) + 1
+    edges[-1] = n - 1
+    keep = np.empty(max_points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Pick the point that spans the largest triangle with the previous pick and the next bucket's mean.
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[bucket + 1] = a
+    return keep
+
+
+def timeline_data(results, title, max_points=MAX_PLOT_POINTS):
+    """TimelineData of process_file_all results, each emotion downsampled to at most max_points."""
+    emotions = sorted({emotion for entry in results for emotion in entry.get("raw_scores", {})})
+    sentence_numbers = np.array([entry["sentence_number"] for entry in results])
+    series = {}
+    for emotion in emotions:
+        scores = np.array([entry.get("raw_scores", {}).get(emotion, 0.0) for entry in results])
+        keep = lttb(sentence_numbers, scores, max_points)
+        series[emotion] = (sentence_numbers[keep].tolist(), scores[keep].tolist())
+    return TimelineData(title, len(results), series)
+
+
+def data_digest(data, fmt):
+    """Changes whenever the rendered plot would."""
+    return fingerprint(fmt, data.title, data.sentences, data.series)
+
+
+# ---- Renderers ----
+def _render_png(data, path):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    for emotion, (xs, ys) in data.series.items():
+        marker = "o" if len(xs) <= MARKER_LIMIT else None
+        axes.plot(xs, ys, marker=marker, markersize=4, linewidth=1.2, label=emotion)
+    axes.set_xlabel("Sentence Number")
+    axes.set_ylabel("Raw Blended Emotion Score")
+    axes.set_title(data.title)
+    if data.series:
+        axes.legend()
+    figure.tight_layout()
+    figure.savefig(path, format="png")
+
+
+def _ticks(low, high, count=5):
+    if high <= low:
+        return [low]
+    return [low + (high - low) * i / (count - 1) for i in range(count)]
+
+
+def _svg(data, width=1200, height=600):
+    left, right, top, bottom = 70, 20, 40, 50
+    plot_w, plot_h = width - left - right, height - top - bottom
+    xs_all = [x for xs, _ in data.series.values() for x in xs] or [1]
+    ys_all = [y for _, ys in data.series.values() for y in ys] or [0.0]
+    x_min, x_max = min(xs_all), max(xs_all)
+    y_min, y_max = min(0.0, min(ys_all)), max(ys_all) or 1.0
+
+    def sx(x):
+        return left + (x - x_min) / ((x_max - x_min) or 1) * plot_w
+
+    def sy(y):
+        return top + plot_h - (y - y_min) / ((y_max - y_min) or 1) * plot_h
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'font-family="sans-serif" font-size="12">',
+        f'<rect width="{width}" height="{height}" fill="white"/>',
+        f'<text x="{width / 2:.0f}" y="24" text-anchor="middle" font-size="16">{html.escape(data.title)}</text>',
+        f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#444"/>'
+    ]
+    for x in _ticks(x_min, x_max):
+        parts.append(f'<text x="{sx(x):.1f}" y="{top + plot_h + 18}" text-anchor="middle">{round(x)}</text>')
+    for y in _ticks(y_min, y_max):
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{sy(y):.1f}" y2="{sy(y):.1f}" stroke="#ddd"/>')
+        parts.append(f'<text x="{left - 6}" y="{sy(y) + 4:.1f}" text-anchor="end">{y:.2f}</text>')
+    parts.append(f'<text x="{left + plot_w / 2:.0f}" y="{height - 10}" text-anchor="middle">Sentence Number</text>')
+    parts.append(f'<text transform="translate(16 {top + plot_h / 2:.0f}) rotate(-90)" '
+                 f'text-anchor="middle">Raw Blended Emotion Score</text>')
+    for i, (emotion, (xs, ys)) in enumerate(data.series.items()):
+        color = PALETTE[i % len(PALETTE)]
+        points = " ".join(f"{sx(x):.1f},{sy(y):.1f}" for x, y in zip(xs, ys))
+        parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{points}">'
+                     f'<title>{html.escape(emotion)}</title></polyline>')
+        legend_y = top + 16 + i * 18
+        parts.append(f'<line x1="{left + plot_w - 130}" x2="{left + plot_w - 110}" y1="{legend_y - 4}" '
+                     f'y2="{legend_y - 4}" stroke="{color}" stroke-width="3"/>')
+        parts.append(f'<text x="{left + plot_w - 104}" y="{legend_y}">{html.escape(emotion)}</text>')
+    parts.append("</svg>")
+    return "\n".join(parts)
+
+
+def _render_svg(data, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_svg(data))
+
+
+def _render_html(data, path):
+    note = f"{data.sentences} sentences"
+    if any(len(xs) < data.sentences for xs, _ in data.series.values()):
+        note += f", downsampled to at most {max(len(xs) for xs, _ in data.series.values())} points per emotion"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(data.title)}</title>"
+                f"</head>\n<body style=\"margin:0;font-family:sans-serif\">\n{_svg(data)}\n"
+                f"<p style=\"margin:0 70px;color:#666\">{html.escape(note)}</p>\n</body></html>\n")
+
+
+RENDERERS = {
+    "png": _render_png,
+    "svg": _render_svg,
+    "html": _render_html
+}
+
+
+def render_timeline(data, path, fmt="png"):
+    """Write data to path in fmt. Returns the render time in seconds."""
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    RENDERERS[fmt](data, tmp_path)
+    # Readers never see a half-written plot.
+    os.replace(tmp_path, path)
+    return time.perf_counter() - started
+
+
+class PlotRenderer:
+    """
+    Renders timelines in the background. With workers <= 1 a single thread draws while the
+    caller keeps scoring (matplotlib's Agg canvas is only ever used from that thread); with
+    more, plots are spread over spawned processes. close() waits for every plot and returns
+    the render times.
+    """
+
+    def __init__(self, workers=1):
+        if workers > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plot-render")
+        self._futures = []
+
+    def submit(self, data, path, fmt="png"):
+        self._futures.append((path, self._pool.submit(render_timeline, data, path, fmt)))
+
+    def close(self):
+        timings = []
+        try:
+            for path, future in self._futures:
+                timings.append(future.result())
+                print(f"Plot saved to {path}")
+        finally:
+            self._futures = []
+            self._pool.shutdown(wait=True)
+        return timings
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()